@@ -101,3 +101,12 @@ def find_app_auxiliary(fname):
     if not value:
         CError("App auxiliary file", fname)
     return value
+
+#The parse cache (MidiParseCache.py) is used only if ParseCachePath is configured; its size limit,
+#ParseCacheMegabytes, defaults to 256.
+def get_parse_cache_config():
+    path = ConfigDictionary.get("ParseCachePath", None)
+    if not path:
+        return (None, None)
+    megabytes = ConfigDictionary.get("ParseCacheMegabytes", 256)
+    return (os.path.abspath(os.path.expanduser(path)), int(megabytes * 1024 * 1024))
@@ -0,0 +1,113 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+# asyncio interface to reading, time-modelling and writing MIDI files, for services that handle many
+# files at once.
+
+import sys
+assert(sys.version_info[0] >= 3)
+
+import io
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import ConfigMan
+import midi
+assert midi == ConfigMan.getMidi()
+import MidiTimeModel
+import MidiParseCache
+
+"""
+Coroutine counterparts of midi.read_midifile, MidiTimeModel.build_time_model, ConverterBase.read_and_time_model
+and midi.write_midifile.  None of them blocks the event loop: file contents are read and written by an I/O
+executor, and parsing, time-model building and encoding, which are CPU-bound, are done by a parse executor,
+so one loop can have many files in progress at once, each one's disk waits overlapping the others' parsing:
+
+    midi_io = AsyncMidiIO(parse_executor=concurrent.futures.ProcessPoolExecutor())
+    results = await asyncio.gather(*[midi_io.read_and_time_model(path) for path in paths])
+
+Either executor defaults to the loop's default executor (threads).  Threads overlap I/O, but parsing holds
+the GIL, so to parse on several CPUs at once give a ProcessPoolExecutor as the parse executor; the jobs are
+module-level functions of plain arguments for that reason, and Patterns and TimeModels come back pickled.
+With a ProcessPoolExecutor, parsing (and loading from the parse cache) pauses the cyclic collector in the worker,
+as FileReader.read_parallel does (midi.gc_paused); in threads it doesn't, since that would pause it for the whole
+process, and so for every other thread, while each file is parsed.  build_time_model and write_midifile send
+their Pattern to the executor, which to a process pool costs a pickling of it; with a process pool, prefer
+read_and_time_model, which builds the model where the file is parsed.
+
+The configured parse cache (MidiParseCache.py) is used by read_and_time_model just as ConverterBase uses it.
+"""
+
+
+#Executor jobs.
+def read_file_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def write_file_bytes(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def parse_midi_bytes(data, compact=False, pause_gc=False):
+    if not pause_gc:
+        return midi.read_midifile(io.BytesIO(data), compact=compact)
+    with midi.gc_paused():
+        return midi.read_midifile(io.BytesIO(data), compact=compact)
+
+def parse_and_time_model(data, start_measure, pause_gc=False):
+    pattern = parse_midi_bytes(data, pause_gc=pause_gc)
+    return (pattern, MidiTimeModel.build_time_model(pattern, start_measure, as_read=True))
+
+def cached_read_and_time_model(cache, path, start_measure, pause_gc=False):
+    (pattern, time_model, cached) = cache.read_and_time_model(path, start_measure, pause_gc)
+    return (pattern, time_model)
+
+def encode_pattern(pattern):
+    buf = io.BytesIO()
+    midi.write_midifile(buf, pattern)
+    return buf.getvalue()
+
+
+class AsyncMidiIO(object):
+    def __init__(self, parse_executor=None, io_executor=None):
+        self.parse_executor = parse_executor
+        self.io_executor = io_executor
+        self.pause_gc = isinstance(parse_executor, ProcessPoolExecutor)   #only there is the collector the job's own
+
+    async def run_io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, fn, *args)
+
+    async def run_parse(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.parse_executor, fn, *args)
+
+    async def read_midifile(self, path, compact=False):
+        data = await self.run_io(read_file_bytes, path)
+        return await self.run_parse(parse_midi_bytes, data, compact, self.pause_gc)
+
+    async def build_time_model(self, pattern, start_measure=1):
+        return await self.run_parse(MidiTimeModel.build_time_model, pattern, start_measure)
+
+    #(pattern, time model), as ConverterBase.read_and_time_model sets them; path must be absolute.
+    async def read_and_time_model(self, path, start_measure=1):
+        cache = MidiParseCache.configured_cache()
+        if cache is not None:
+            return await self.run_parse(cached_read_and_time_model, cache, path, start_measure, self.pause_gc)
+        data = await self.run_io(read_file_bytes, path)
+        return await self.run_parse(parse_and_time_model, data, start_measure, self.pause_gc)
+
+    async def write_midifile(self, path, pattern):
+        data = await self.run_parse(encode_pattern, pattern)
+        await self.run_io(write_file_bytes, path, data)
+
+
+#With the loop's default executor for both.
+async def read_midifile(path, compact=False):
+    return await AsyncMidiIO().read_midifile(path, compact)
+
+async def build_time_model(pattern, start_measure=1):
+    return await AsyncMidiIO().build_time_model(pattern, start_measure)
+
+async def write_midifile(path, pattern):
+    await AsyncMidiIO().write_midifile(path, pattern)
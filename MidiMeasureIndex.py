@@ -0,0 +1,210 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+# Per-file index of where each measure starts in each track of a MIDI file, optionally kept in a sidecar
+# file next to it, so that a stretch of measures can be decoded without decoding what precedes it.
+
+import sys
+assert(sys.version_info[0] >= 3)
+
+import os
+import json
+import tempfile
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from warnings import warn
+
+import midi
+from MidiTimeModel import TimeModel
+
+"""
+A MeasureIndex is made by one lazy (scan-only, see midi/lazytrack.py) read of the file, which decodes only the
+tempo and time-signature events (see midi.ConductorMap).  It holds the file's tempo and time-signature changes, from which the time model is
+rebuilt, the start tick of each measure, and, for each track and each measure start, a "mark": the index of the
+first event at or after it, that event's byte address in the file, the running status in effect before it, and
+the track's absolute tick before it.  Decoding from a mark on, with the parser primed with that running status,
+yields exactly the events that reading the whole track would, and the mark's tick makes their absolute ticks.
+Each track's per-status event counts are kept too, for dumpmidi's track summaries.
+
+Measure numbers in the index count from 0; callers numbering the first measure otherwise subtract their own
+starting measure.  The sidecar, FILE.mindex beside FILE, is JSON, and is used as long as the MIDI file's size
+and modification time are as they were when it was written; otherwise it is remade (and rewritten).
+"""
+
+INDEX_FORMAT = 2
+SUFFIX = ".mindex"
+
+
+def sidecar_path(path):
+    return path + SUFFIX
+
+def file_key(path):
+    stat = os.stat(path)
+    return {"format": INDEX_FORMAT, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+#Effective status before the event at dx: that of the last general message preceding it, if any.
+def running_status_before(statuses, dx):
+    while dx > 0:
+        dx -= 1
+        if statuses[dx] < 0xF0:
+            return statuses[dx]
+    return None
+
+#(measure number, start tick) of each measure the time model covers, including one starting at its final tick.
+def measure_starts(time_model):
+    starts = []
+    for tme in time_model:
+        if tme.len_ticks <= 0:
+            continue
+        for k in range((tme.len_ticks - 1) // tme.ticks_per_measure + 1):
+            measure = tme.base_measure + k
+            if not starts or measure > starts[-1][0]:   #a measure broken by a signature change starts once
+                starts.append((measure, tme.tick + k * tme.ticks_per_measure))
+    final = time_model.ticks_to_MB(time_model.final_tick).measure
+    if not starts or final > starts[-1][0]:
+        starts.append((final, time_model.final_tick))
+    return starts
+
+
+class MeasureIndex(object):
+    def __init__(self, header):
+        self.header = header
+        self.resolution = header["resolution"]
+        self.format = header["midi_format"]
+        self.tracks = header["tracks"]
+        self.measures = [measure for (measure, tick) in header["measures"]]
+
+    #Scans the file at path (one lazy read) and indexes it.
+    @classmethod
+    def build(cls, path):
+        reader = midi.FileReader()
+        with open(path, "rb") as f:
+            pattern = reader.parse_file_header(f)
+            scans = []
+            for tx in range(len(pattern)):
+                trksz = reader.parse_track_header(f)
+                base = f.tell()
+                trackdata = bytearray(f.read(trksz))
+                pattern[tx] = reader.scan_track_data(trackdata, 0, len(trackdata), pattern.conductor_map)
+                scans.append((base, base + trksz, pattern[tx].offsets(), pattern[tx].statuses()))
+        conductor = []
+        for (tick, event) in pattern.conductor_map.events():
+            if isinstance(event, midi.TimeSignatureEvent):
+                conductor.append(["signature", tick, event.numerator, event.denominator])
+            else:
+                conductor.append(["tempo", tick, event.bpm])
+        track_ticks = [list(accumulate(track.rel_ticks())) for track in pattern]
+        final_tick = pattern.conductor_map.end_tick
+        header = dict(file_key(path), resolution=pattern.resolution, midi_format=pattern.format,
+                      running_status_errors=reader.has_running_status_errors(),
+                      conductor=conductor, final_tick=final_tick)
+        starts = measure_starts(cls.make_time_model(header, 0))
+        header["measures"] = starts
+        header["tracks"] = [cls.index_track(scan, ticks, starts) for (scan, ticks) in zip(scans, track_ticks)]
+        return cls(header)
+
+    @staticmethod
+    def index_track(scan, abs_ticks, starts):
+        (base, end, offsets, statuses) = scan
+        marks = []
+        for (measure, start_tick) in starts:
+            dx = bisect_left(abs_ticks, start_tick)
+            if dx < len(offsets):
+                marks.append([dx, base + offsets[dx], running_status_before(statuses, dx),
+                              abs_ticks[dx - 1] if dx else 0])
+            else:
+                marks.append([dx, end, None, abs_ticks[-1] if dx else 0])
+        return {"address": base, "end": end, "events": len(offsets), "marks": marks,
+                "status_counts": sorted(Counter(statuses).items())}
+
+    #The index in the sidecar of path, if that is there and describes the file as it is now, else None.
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(sidecar_path(path)) as f:
+                header = json.load(f)
+            if any(header.get(name) != value for (name, value) in file_key(path).items()):
+                return None
+        except (OSError, ValueError):
+            return None     #missing, damaged, or stale: make it anew
+        return cls(header)
+
+    #Written to a temporary file and renamed, so that no reader sees a partial sidecar.
+    def save(self, path):
+        target = sidecar_path(path)
+        (fd, temp) = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(target)))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.header, f, separators=(",", ":"))
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp, 0o666 & ~umask)   #as an ordinary file, not mkstemp's owner-only one
+            os.replace(temp, target)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    @staticmethod
+    def make_time_model(header, starting_measure):
+        model = TimeModel(resolution=header["resolution"], starting_measure=starting_measure)
+        for change in header["conductor"]:
+            if change[0] == "signature":
+                model.add_signature(change[1], (change[2], change[3]))
+            else:
+                model.add_tempo(change[1], change[2])
+        model.finish(header["final_tick"])
+        return model
+
+    #The same model as MidiTimeModel.build_time_model of the file's Pattern.
+    def time_model(self, starting_measure=0):
+        return self.make_time_model(self.header, starting_measure)
+
+    def warn_as_read(self):
+        if self.header["running_status_errors"]:
+            warn(midi.RUNNING_STATUS_COMPATIBILITY_MESSAGE, Warning)
+
+    #The mark of the first measure numbered first or later, or of the track's end, if there's none.
+    def mark(self, track_number, first):
+        i = bisect_left(self.measures, first)
+        track = self.tracks[track_number]
+        if i < len(self.measures):
+            return track["marks"][i]
+        return [track["events"], track["end"], None, None]
+
+    #(absolute tick, event) for each event of the track in measures first through last (index numbering),
+    #decoded from the open file f, and only those events.
+    def events_in_measures(self, f, track_number, first, last):
+        (dx, address, running_status, abs_tick) = self.mark(track_number, first)
+        (end_dx, end_address) = self.mark(track_number, last + 1)[:2]
+        if dx >= end_dx:
+            return
+        f.seek(address)
+        data = f.read(end_address - address)
+        decoder = midi.FileReader()
+        decoder.RunningStatus = running_status
+        decoder.last_event_class = midi.NoteOnEvent   #validation was done in the scan; any channel message
+        decoder.RSCompat_reported = True
+        pos = 0
+        for i in range(end_dx - dx):
+            (event, pos) = decoder.parse_midi_event_at(data, pos, len(data))
+            abs_tick += event.tick
+            yield (abs_tick, event)
+
+
+#The index of the MIDI file at path, from its sidecar if that is current; if not, it is made, and, if persist,
+#saved as the sidecar (if the directory can't be written, the index is just used this once).
+def measure_index(path, persist=True):
+    index = MeasureIndex.load(path)
+    if index is not None:
+        index.warn_as_read()    #as the scan would have
+        return index
+    index = MeasureIndex.build(path)
+    if persist:
+        try:
+            index.save(path)
+        except OSError as e:
+            warn("Cannot save measure index %s: %s" % (sidecar_path(path), e), Warning)
+    return index
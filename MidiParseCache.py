@@ -0,0 +1,211 @@
+#! /usr/bin/python
+
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+# Opt-in on-disk cache of parsed MIDI files and their time models, for re-running insreg and phraseit
+# on the same file.
+
+import sys
+assert(sys.version_info[0] >= 3)
+
+import os
+import io
+import glob
+import zlib
+import pickle
+import hashlib
+import argparse
+import tempfile
+from warnings import warn
+
+import ConfigMan
+import midi
+assert midi == ConfigMan.getMidi()
+import MidiTimeModel
+
+"""
+When ParseCachePath is set in the configuration file (see ConfigMan.get_parse_cache_config),
+ConverterBase.read_and_time_model keeps the Pattern read from each MIDI file, and the TimeModel built
+from it, in a file of that directory, and reloads them from there, rather than parsing the MIDI file
+again, as long as the MIDI file's size, modification time and content hash, and the midi package's
+own source, are as they were when the entry was made (the hash is checked last, but always).  An
+entry is a short pickled header followed by the zlib-compressed pickle of the two; unpickling, with
+the cyclic garbage collector paused as for parallel reading, is several times faster than parsing.
+The header records whether the file uses running status after Meta or Sysex, so that reading it from
+the cache gives the reader's compatibility warning just as parsing it would.
+Entries are named by a hash of the MIDI file's path, so there is one per file.
+
+The cache is kept under ParseCacheMegabytes by dropping the least recently used entries (each use
+touches its entry's modification time) whenever one is added.  "MidiParseCache.py -p" purges it,
+-l lists it.  The cache directory holds pickles, and so must be writable only by its owner.
+"""
+
+CACHE_FORMAT = 2
+MAGIC = b"VPOMTPC1"
+SUFFIX = ".pcache"
+
+
+def midi_package_stamp():
+    sources = glob.glob(os.path.join(os.path.dirname(midi.__file__), "*.py"))
+    return max([os.stat(source).st_mtime_ns for source in sources] + [0])
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParseCache(object):
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def entry_path(self, path):
+        return os.path.join(self.directory, hashlib.sha1(path.encode("utf-8")).hexdigest() + SUFFIX)
+
+    def entry_paths(self):
+        return glob.glob(os.path.join(self.directory, "*" + SUFFIX))
+
+    def file_key(self, path, data):
+        stat = os.stat(path)
+        return {"format": CACHE_FORMAT, "python": sys.version_info[:2], "midi": midi_package_stamp(),
+                "path": path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": content_hash(data)}
+
+    #(pattern, time model, from the cache?) for the MIDI file at path (absolute), reading and
+    #storing it if the cache can't supply it.  pause_gc is for load.
+    def read_and_time_model(self, path, start_measure, pause_gc=True):
+        with open(path, "rb") as f:
+            data = f.read()
+        key = self.file_key(path, data)
+        entry = self.entry_path(path)
+        loaded = self.load(entry, key, pause_gc)
+        if loaded is not None:
+            (header, pattern, time_model) = loaded
+            if header["running_status_errors"]:
+                warn(midi.RUNNING_STATUS_COMPATIBILITY_MESSAGE, Warning)   #as the parse would have
+            if header["start_measure"] != start_measure:
+                time_model = MidiTimeModel.build_time_model(pattern, start_measure, as_read=True)
+            return (pattern, time_model, True)
+        reader = midi.FileReader()
+        pattern = reader.read(io.BytesIO(data))   #as read_midifile
+        time_model = MidiTimeModel.build_time_model(pattern, start_measure, as_read=True)
+        self.store(entry, dict(key, start_measure=start_measure,
+                               running_status_errors=reader.has_running_status_errors()), pattern, time_model)
+        return (pattern, time_model, False)
+
+    def read_header(self, f):
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        return pickle.load(f)
+
+    #None unless the entry exists and was made from the same file, as key describes it.  The collector is paused
+    #while unpickling, unless pause_gc is false (from a thread that mustn't stop it for the whole process).
+    def load(self, entry, key, pause_gc=True):
+        try:
+            with open(entry, "rb") as f:
+                header = self.read_header(f)
+                if header is None or any(header.get(name) != value for (name, value) in key.items()):
+                    return None
+                blob = f.read()
+            blob = zlib.decompress(blob)
+            if pause_gc:
+                with midi.gc_paused():
+                    (pattern, time_model) = pickle.loads(blob)
+            else:
+                (pattern, time_model) = pickle.loads(blob)
+        except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError,
+                pickle.UnpicklingError, zlib.error):
+            return None     #missing, damaged, or of another version: just parse anew
+        os.utime(entry)     #most recently used
+        return (header, pattern, time_model)
+
+    #Written to a temporary file and renamed, so that no reader sees a partial entry.
+    def store(self, entry, header, pattern, time_model):
+        blob = zlib.compress(pickle.dumps((pattern, time_model), pickle.HIGHEST_PROTOCOL), 1)
+        if len(blob) > self.max_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        (fd, temp) = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC)
+                pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+                f.write(blob)
+            os.replace(temp, entry)
+        except BaseException:
+            os.unlink(temp)
+            raise
+        self.evict(keep=entry)
+
+    #Least recently used first, until the total is within the limit.
+    def evict(self, keep=None):
+        entries = []
+        for entry in self.entry_paths():
+            try:
+                stat = os.stat(entry)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+        total = sum(size for (mtime, size, entry) in entries)
+        for (mtime, size, entry) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry != keep:
+                self.remove(entry)
+                total -= size
+
+    def remove(self, entry):
+        try:
+            os.unlink(entry)
+        except OSError:
+            pass
+
+    def purge(self):
+        entries = self.entry_paths()
+        for entry in entries:
+            self.remove(entry)
+        return len(entries)
+
+    #(MIDI file path, entry size, entry path) of each entry, most recently used first.
+    def listing(self):
+        rows = []
+        for entry in sorted(self.entry_paths(), key=os.path.getmtime, reverse=True):
+            with open(entry, "rb") as f:
+                try:
+                    header = self.read_header(f) or {}
+                except (EOFError, pickle.UnpicklingError):
+                    header = {}
+            rows.append((header.get("path", "?"), os.path.getsize(entry), entry))
+        return rows
+
+
+#The configured cache, or None if there is none.
+def configured_cache():
+    (directory, max_bytes) = ConfigMan.get_parse_cache_config()
+    if directory is None:
+        return None
+    return ParseCache(directory, max_bytes)
+
+def main():
+    parser = argparse.ArgumentParser(description="List or purge the MIDI parse cache.")
+    parser.add_argument('-l', '--list', action="store_true", help="list the entries, most recently used first")
+    parser.add_argument('-p', '--purge', action="store_true", help="remove all the entries")
+    parser.add_argument('-d', '--directory', metavar="path", help="cache directory (default: ParseCachePath)")
+    args = parser.parse_args()
+    if args.directory:
+        cache = ParseCache(os.path.abspath(os.path.expanduser(args.directory)), 0)
+    else:
+        cache = configured_cache()
+        if cache is None:
+            parser.error("No ParseCachePath is configured; give the directory with -d.")
+    if args.list or not args.purge:
+        rows = cache.listing()
+        for (path, size, entry) in rows:
+            print("%10d  %s" % (size, path))
+        print("%d entries, %d bytes, in %s." % (len(rows), sum(row[1] for row in rows), cache.directory))
+    if args.purge:
+        print("Purged %d entries from %s." % (cache.purge(), cache.directory))
+
+if __name__ == "__main__":
+    main()
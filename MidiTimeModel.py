@@ -13,8 +13,8 @@ import midi
 from fractions import Fraction
 from collections import namedtuple
 import weakref
-from bisect import bisect_left
-from operator import attrgetter
+from array import array
+from bisect import bisect_left, bisect_right
 
 EXCEPTIONAL_TIME_SIGNATURES ={
     (6,8) : (3,8),
@@ -30,10 +30,43 @@ VERY_BIG_NUMBER = 999999999
 
 class TimeModelError(RuntimeError): pass
 
+
+#The batch conversions take a sequence of ticks (or seconds), which, if in order, as a track's absolute ticks are,
+#is cut into one slice per model element, converted by comprehensions over the slice, with no per-tick method
+#call.  Other sequences are converted in sorted order, and the results put back in the given one.
+def convert_in_order(values, convert):
+    values = list(values)
+    in_order = sorted(values)
+    if in_order == values:
+        return convert(values)
+    order = sorted(range(len(values)), key=values.__getitem__)
+    results = convert(in_order)
+    unsorted = []
+    for result in results:
+        put = array(result.typecode, result)
+        for (dx, value) in zip(order, result):
+            put[dx] = value
+        unsorted.append(put)
+    return tuple(unsorted)
+
     
+#Rendered beats, by float beat value.  A model's beats are (ticks into the measure) / (ticks per beat), so a piece
+#has few distinct ones, and dumps of long pieces render each many times; rep_beat's Fraction is made once for each.
+#(Only floats: an int beat renders without the ".0" its equal float has.)
+BEAT_STRINGS = {}
+BEAT_STRINGS_LIMIT = 1 << 16   #cleared when full, as computed beats (reg_compiler's ramps) needn't recur
+
 class MeasureBeat(namedtuple("MB0","measure,beat")):
     def __str__(self):
-        return "%d+%s" % (self.measure, self.rep_beat(self.beat))
+        beat = self.beat
+        if type(beat) is not float:
+            return "%d+%s" % (self.measure, self.rep_beat(beat))
+        rep = BEAT_STRINGS.get(beat)
+        if rep is None:
+            if len(BEAT_STRINGS) >= BEAT_STRINGS_LIMIT:
+                BEAT_STRINGS.clear()
+            rep = BEAT_STRINGS[beat] = str(self.rep_beat(beat))
+        return "%d+%s" % (self.measure, rep)
 
     @staticmethod
     def rep_beat(n):
@@ -76,16 +109,22 @@ class TimeModel(list):
             self.tempo_model = TempoModel(self)
         else:
             self.tempo_model = None
-        self.append(TME(0, DEFAULT_TIME_SIGNATURE, self.resolution, starting_measure))
+        self.base_measures = []  #parallel to the TMEs, nondecreasing, for MB_to_ticks to bisect
+        self.append_tme(TME(0, DEFAULT_TIME_SIGNATURE, self.resolution, starting_measure))
         self[-1].finish(VERY_BIG_NUMBER) # should never BMT (be empty).
 
+    def append_tme(self, tme):
+        self.append(tme)
+        self.base_measures.append(tme.base_measure)
+
     def add_signature(self, tick, signature):
         assert len(self),"Should never be empty TimeModel."
         measure = self.ticks_to_MB(tick).measure
         self[-1].finish(tick)
         if self[-1].tick == tick:
             del self[-1]
-        self.append(TME(tick, signature, self.resolution, measure))
+            del self.base_measures[-1]
+        self.append_tme(TME(tick, signature, self.resolution, measure))
         self[-1].finish(VERY_BIG_NUMBER)
 
     def finish(self, end_tick):
@@ -94,9 +133,10 @@ class TimeModel(list):
         self[-1].finish(end_tick)
 
     def dur_to_ticks(self, tickloc, dur):
-        for tme in self:
-            if tme.ticks_to_MB(tickloc) is not None:
-                return int(tme.ticks_per_beat*dur/tme.beat)
+        i = bisect_left(self, tickloc)
+        if i < len(self) and self[i].ticks_to_MB(tickloc) is not None:
+            tme = self[i]
+            return int(tme.ticks_per_beat*dur/tme.beat)
         raise TimeModelError("dur_to_ticks: Cannot resolve tick %d to measure/beat reference." % tickloc)
 
     def add_tempo(self, tick, qpm):
@@ -111,6 +151,25 @@ class TimeModel(list):
         else:
             raise TimeModelError("Tempo Model is not available.")
 
+    def ticks_to_seconds_batch(self, ticks):
+        if self.tempo_model is not None:
+            return self.tempo_model.ticks_to_seconds_batch(ticks)
+        else:
+            raise TimeModelError("Tempo Model is not available.")
+
+    #The tick (nearest) at the given real time, in seconds.
+    def seconds_to_ticks(self, seconds):
+        if self.tempo_model is not None:
+            return self.tempo_model.seconds_to_ticks(seconds)
+        else:
+            raise TimeModelError("Tempo Model is not available.")
+
+    def seconds_to_ticks_batch(self, seconds):
+        if self.tempo_model is not None:
+            return self.tempo_model.seconds_to_ticks_batch(seconds)
+        else:
+            raise TimeModelError("Tempo Model is not available.")
+
     def ticks_to_MB(self, ticks):
         assert len(self), "TimeModel empty at ticks_to_MB time"
         i = bisect_left(self, ticks)
@@ -121,13 +180,55 @@ class TimeModel(list):
             return self[-1].ticks_to_MB(ticks, True)
         raise TimeModelError("Cannot resolve tick %d to measure/beat reference." % ticks)
 
-    def MB_to_ticks(self, measure, beat):  # can't use bisect, __cmp__ works on ticks only.
+    #(measures, beats): arrays of the measure and beat ticks_to_MB gives for each of the ticks.
+    def ticks_to_MB_batch(self, ticks):
+        return convert_in_order(ticks, self.sorted_ticks_to_MB)
+
+    def sorted_ticks_to_MB(self, ticks):
+        measures = array('q')
+        beats = array('d')
+        lo = 0
+        if ticks and ticks[0] < self[0].tick:
+            raise TimeModelError("Cannot resolve tick %d to measure/beat reference." % ticks[0])
         for tme in self:
-            rslt = tme.MB_to_ticks(measure, beat)
+            if tme is self[-1]:   #ticks_to_MB's final tick, too
+                hi = bisect_right(ticks, tme.final_tick, lo)
+            else:
+                hi = bisect_left(ticks, tme.final_tick, lo)
+            if hi > lo:
+                (base, tpm, tpb) = (tme.tick, tme.ticks_per_measure, tme.ticks_per_beat)
+                into = [tick - base for tick in ticks[lo:hi]]
+                whole = [q // tpm for q in into]
+                measures.extend([w + tme.base_measure for w in whole])
+                beats.extend([float(q - w * tpm) / tpb for (q, w) in zip(into, whole)])
+                lo = hi
+        if lo < len(ticks):
+            raise TimeModelError("Cannot resolve tick %d to measure/beat reference." % ticks[lo])
+        return (measures, beats)
+
+    #TMEs' measure ranges don't overlap (one broken by a signature change counts only its whole measures), so
+    #only the last TME starting at or before the measure can have it.  (__cmp__ works on ticks only.)
+    def MB_to_ticks(self, measure, beat):
+        i = bisect_right(self.base_measures, measure) - 1
+        if i >= 0:
+            rslt = self[i].MB_to_ticks(measure, beat)
             if rslt is not None:
                 return rslt
         raise TimeModelError("Cannot resolve (measure,beat) " + str((measure,beat)) + " to tick reference.")
 
+    #The first tick from which ticks_to_MB gives the measure or a later one (final_tick + 1 if none), so that
+    #measures first through last are the ticks from measure_start_tick(first) up to measure_start_tick(last + 1).
+    def measure_start_tick(self, measure):
+        i = bisect_left(self.base_measures, measure)
+        if i > 0:
+            tme = self[i - 1]
+            last_ticks_into = tme.len_ticks if i == len(self) else tme.len_ticks - 1   #final tick is the last's
+            if measure <= tme.base_measure + last_ticks_into // tme.ticks_per_measure:
+                return tme.tick + (measure - tme.base_measure) * tme.ticks_per_measure
+        if i < len(self):
+            return self[i].tick
+        return self.final_tick + 1
+
     @property
     def final_tick(self):
         return self[-1].final_tick
@@ -141,7 +242,22 @@ class TimeModel(list):
         assert self.tempo_model is not None
         self.tempo_model.dump()
 
+    #For lookups of ticks mostly in increasing order (see TimeModelCursor).
+    def cursor(self):
+        return TimeModelCursor(self)
+
     
+    #The tempo model's weak references back to this model are dropped when pickled (MidiParseCache keeps time
+    #models), and remade here.
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.base_measures = [tme.base_measure for tme in self]   #(not in older pickles)
+        if self.tempo_model is not None:
+            self.tempo_model.base_seconds = [tmpe.base_seconds for tmpe in self.tempo_model]
+            self.tempo_model.time_model = weakref.ref(self)
+            for tmpe in self.tempo_model:
+                tmpe.time_model_wr = self.tempo_model.time_model
+
     def process_dynamic_event(self, tick, event):
         if isinstance(event, midi.TimeSignatureEvent):
             self.add_signature(tick, (event.numerator, event.denominator))
@@ -151,21 +267,78 @@ class TimeModel(list):
             pass    #allow use as a filter, choosing its own events of interest
 
 
+#A position in a TimeModel, for the common sweep through a track's ticks in order: each lookup first tries the
+#TME and tempo element of the last one, then the next ones, and only bisects (as the model's own lookups always
+#do) on any other jump, backward or forward.  Answers are the model's own, and stay so as the model grows (as
+#the incremental readers build it), since the cursor's elements are checked afresh for every lookup.
+class TimeModelCursor(object):
+    def __init__(self, time_model):
+        self.time_model = time_model
+        self.tme_index = 0
+        self.tempo_index = 0
+
+    def ticks_to_MB(self, tick):
+        model = self.time_model
+        last = len(model) - 1
+        i = min(self.tme_index, last)
+        if not model[i].tick <= tick < model[i].final_tick:
+            if i < last and model[i + 1].tick <= tick < model[i + 1].final_tick:
+                i += 1
+            else:
+                i = min(bisect_left(model, tick), last)
+        tme = model[i]
+        ticks_into_tme = tick - tme.tick
+        if not (0 <= ticks_into_tme < tme.len_ticks or (i == last and ticks_into_tme == tme.len_ticks)):
+            raise TimeModelError("Cannot resolve tick %d to measure/beat reference." % tick)
+        self.tme_index = i
+        #As TME.ticks_to_MB, whose range check this has just made.
+        measures_into_tme = ticks_into_tme // tme.ticks_per_measure
+        beats_into_measure = float(ticks_into_tme - measures_into_tme * tme.ticks_per_measure) / tme.ticks_per_beat
+        return MeasureBeat(measures_into_tme + tme.base_measure, beats_into_measure)
+
+    def ticks_to_seconds(self, tick):
+        tempo_model = self.time_model.tempo_model
+        if tempo_model is None:
+            raise TimeModelError("Tempo Model is not available.")
+        last = len(tempo_model) - 1
+        j = min(self.tempo_index, last)
+        if not tempo_model[j].includes(tick):
+            if j < last and tempo_model[j + 1].includes(tick):
+                j += 1
+            else:
+                j = min(bisect_left(tempo_model, tick), last)
+                if not tempo_model[j].includes(tick):
+                    raise TimeModelError("Can't convert tick to real-time seconds: " + str(tick))
+        self.tempo_index = j
+        tmpe = tempo_model[j]
+        return tmpe.base_seconds + (tick - tmpe.base_tick) * tmpe.seconds_per_tick
+
+    #(measure+beat, seconds) of the tick.
+    def locate(self, tick):
+        return (self.ticks_to_MB(tick), self.ticks_to_seconds(tick))
+
+
 class TempoModel(list):
     def __init__(self, time_model):
         self.time_model = weakref.ref(time_model)
         self.ticks_per_quarter = time_model.resolution
         self.seconds_so_far = 0
-        self.append(TempoElement(0, self.time_model, DEFAULT_TEMPO_QPM, 0))
+        self.base_seconds = []  #parallel to the elements, increasing, for seconds_to_ticks to bisect
+        self.append_tmpe(TempoElement(0, self.time_model, DEFAULT_TEMPO_QPM, 0))
         self[-1].finish(VERY_BIG_NUMBER)
         self.seconds_so_far = 0
         self.icache = 0  #why not, we have one...
 
+    def append_tmpe(self, tmpe):
+        self.append(tmpe)
+        self.base_seconds.append(tmpe.base_seconds)
+
     def add_tempo(self, tick, quarters_per_minute):
         self.seconds_so_far = self[-1].finish(tick)  #Guaranteed to be somebody there.
         if self[-1].length_ticks == 0: #two successive changes at same tick.
             del self[-1]  #Gets rid of initial stand-in too, if real guy appears at tick 0
-        self.append(TempoElement(tick, self.time_model, quarters_per_minute, self.seconds_so_far))
+            del self.base_seconds[-1]
+        self.append_tmpe(TempoElement(tick, self.time_model, quarters_per_minute, self.seconds_so_far))
         
 
     def ticks_to_seconds(self, tick):
@@ -177,6 +350,55 @@ class TempoModel(list):
         self.icache = i
         return self[i].tick_to_seconds(tick)
 
+    #An array of what ticks_to_seconds gives for each of the ticks.
+    def ticks_to_seconds_batch(self, ticks):
+        return convert_in_order(ticks, self.sorted_ticks_to_seconds)[0]
+
+    def sorted_ticks_to_seconds(self, ticks):
+        seconds = array('d')
+        lo = 0
+        if ticks and ticks[0] < self[0].base_tick:
+            raise TimeModelError("Can't convert tick to real-time seconds: " + str(ticks[0]))
+        for tmpe in self:
+            hi = bisect_right(ticks, tmpe.end_tick, lo)   #an element's end tick is its own (see __lt__)
+            if hi > lo:
+                (base_seconds, base_tick, spt) = (tmpe.base_seconds, tmpe.base_tick, tmpe.seconds_per_tick)
+                seconds.extend([base_seconds + (tick - base_tick) * spt for tick in ticks[lo:hi]])
+                lo = hi
+        if lo < len(ticks):
+            raise TimeModelError("Can't convert tick to real-time seconds: " + str(ticks[lo]))
+        return (seconds,)
+
+    #Elements never have no length, so their base seconds increase, and the one a time falls in is the last to
+    #start at or before it; the last element also has its end.
+    def seconds_to_ticks(self, seconds):
+        i = bisect_right(self.base_seconds, seconds) - 1
+        if i < 0 or (i == len(self) - 1 and seconds > self[-1].base_seconds + self[-1].length_seconds):
+            raise TimeModelError("Can't convert real-time seconds to tick: " + str(seconds))
+        return self[i].seconds_to_tick(seconds)
+
+    #An array of what seconds_to_ticks gives for each of the times.
+    def seconds_to_ticks_batch(self, seconds):
+        return convert_in_order(seconds, self.sorted_seconds_to_ticks)[0]
+
+    def sorted_seconds_to_ticks(self, seconds):
+        ticks = array('q')
+        lo = 0
+        if seconds and seconds[0] < 0:
+            raise TimeModelError("Can't convert real-time seconds to tick: " + str(seconds[0]))
+        for (i, tmpe) in enumerate(self):
+            if i == len(self) - 1:
+                hi = bisect_right(seconds, tmpe.base_seconds + tmpe.length_seconds, lo)
+            else:
+                hi = bisect_left(seconds, self.base_seconds[i + 1], lo)
+            if hi > lo:
+                (base_seconds, base_tick, spt) = (tmpe.base_seconds, tmpe.base_tick, tmpe.seconds_per_tick)
+                ticks.extend([round(base_tick + (sec - base_seconds) / spt) for sec in seconds[lo:hi]])
+                lo = hi
+        if lo < len(seconds):
+            raise TimeModelError("Can't convert real-time seconds to tick: " + str(seconds[lo]))
+        return (ticks,)
+
     def finish(self, end_tick):
         self[-1].finish(end_tick)
 
@@ -190,6 +412,9 @@ class TempoModel(list):
             tmpe.dump(i)
         print("END at %8.4f seconds." % self.end_seconds())
 
+    def __getstate__(self):
+        return dict(self.__dict__, time_model=None)
+
 
 class TempoElement(object):
     def __init__(self, tick, time_model_wr, quarters_per_minute, base_seconds):
@@ -207,6 +432,9 @@ class TempoElement(object):
         self.end_tick = VERY_BIG_NUMBER
         self.compute_length()
 
+    def __getstate__(self):
+        return dict(self.__dict__, time_model_wr=None)
+
     def includes(self, tick):
         return (tick >= self.base_tick) and (tick <= self.end_tick) #yes the end overlaps for this purpose.
 
@@ -231,6 +459,9 @@ class TempoElement(object):
         assert self.includes(tick) or tick == self.end_tick,"Tempo model element sent a tick not its own."
         return self.base_seconds + (tick - self.base_tick) * self.seconds_per_tick
 
+    def seconds_to_tick(self, seconds):
+        return round(self.base_tick + (seconds - self.base_seconds) / self.seconds_per_tick)
+
     def dump(self, i):
         mb = self.time_model_wr().ticks_to_MB(self.base_tick)
         print("TmpE %2d mb %-08s tick %5d sec %6.2f: %5.1f qt/m, %4.0f ticks/sec. Len %5d ticks = %7.3f sec"
@@ -302,16 +533,31 @@ class TME(object):  # Time model element  -- new time management system 1/10/17
         return self.base_measure + self.len_measures
 
 
-def build_time_model(midilist, starting_measure=0):
+#Time signatures and tempi are taken from every track, in tick order (in practice they are all in track 0).  With
+#as_read, the caller's word that the pattern is as the reader made it, they come from the ConductorMap the reader
+#made as it parsed, with no pass over the events; otherwise (the pattern may have been changed since) from the tracks.
+def build_time_model(midilist, starting_measure=0, as_read=False):
     model = TimeModel(resolution=midilist.resolution, starting_measure=starting_measure)
     assert midilist[0].tick_relative
-    cur_tick = 0
-    for event in midilist[0]:  #time sigs and tempi must appear here.
-        cur_tick += event.tick
+    conductor_map = getattr(midilist, "conductor_map", None) if as_read else None
+    if conductor_map is None or len(conductor_map.track_lengths) != len(midilist):
+        conductor_map = make_conductor_map(midilist)
+    for (cur_tick, event) in conductor_map.events():
         if isinstance(event, midi.TimeSignatureEvent):
             model.add_signature(cur_tick, (event.numerator, event.denominator))
-        elif isinstance(event, midi.SetTempoEvent):
+        else:
             model.add_tempo(cur_tick, event.bpm) #includes incremental logic
-    highest_sum = max(0, *[sum(map(attrgetter("tick"), track)) for track in midilist]) # need 2 args!
-    model.finish(highest_sum)
+    model.finish(conductor_map.end_tick)
     return model
+
+def make_conductor_map(midilist):
+    conductor_map = midi.ConductorMap()
+    for track in midilist:
+        cur_tick = 0
+        events = []
+        for event in track:
+            cur_tick += event.tick
+            if isinstance(event, midi.CONDUCTOR_EVENT_CLASSES):
+                events.append((cur_tick, event))
+        conductor_map.add_track(events, cur_tick)
+    return conductor_map
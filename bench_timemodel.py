@@ -0,0 +1,110 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+from __future__ import print_function
+import argparse
+import random
+import timeit
+
+from MidiTimeModel import TimeModel, TimeModelError
+
+"""
+Microbenchmark of TimeModel queries on a mixed-meter stress model: "changes" time-signature changes in
+rotation among simple, compound and odd meters, each after one to four measures, some of them in mid-measure
+(as a pickup or a cut does), with a tempo change at every tenth.  MB_to_ticks and dur_to_ticks are timed over
+deterministic queries spread through the piece, against the linear scans of the TMEs they replaced, and the
+batch ticks_to_MB_batch and ticks_to_seconds_batch, over the queries' ticks in order, as a track's are, against
+per-tick ticks_to_MB and ticks_to_seconds, as is a TimeModelCursor's locate, sweeping the same ticks.  Each
+is first checked to agree with what it is timed against.
+
+   python bench_timemodel.py [-c CHANGES] [-n COUNT] [-r REPEAT] [-s SEED]
+"""
+
+METERS = [(4, 4), (3, 4), (5, 8), (7, 8), (6, 8), (2, 2), (12, 8), (3, 8), (5, 4), (9, 8)]
+RESOLUTION = 480
+
+def stress_model(changes, seed):
+    rng = random.Random(seed)
+    model = TimeModel(RESOLUTION, starting_measure=1)
+    tick = 0
+    for i in range(changes):
+        tme = model[-1]
+        tick += tme.ticks_per_measure * rng.randint(1, 4)
+        if rng.random() < 0.1:
+            tick += tme.ticks_per_beat * rng.randint(1, tme.beats_per_measure)   #a broken measure
+        model.add_signature(tick, METERS[i % len(METERS)])
+        if i % 10 == 0:
+            model.add_tempo(tick, 60 + (i * 37) % 90)
+    model.finish(tick + model[-1].ticks_per_measure * 4)
+    return model
+
+def make_queries(model, count, seed):
+    rng = random.Random(seed)
+    first = model[0].base_measure
+    last = model[-1].final_measure
+    measures = [(rng.randint(first, last), rng.choice((0, 1, 2, 1.5))) for i in range(count)]
+    ticks = [rng.randrange(model.final_tick) for i in range(count)]
+    return (measures, ticks)
+
+#The linear scans MB_to_ticks and dur_to_ticks used to make.
+def linear_MB_to_ticks(model, measure, beat):
+    for tme in model:
+        rslt = tme.MB_to_ticks(measure, beat)
+        if rslt is not None:
+            return rslt
+    raise TimeModelError("Cannot resolve (measure,beat) " + str((measure,beat)) + " to tick reference.")
+
+def linear_dur_to_ticks(model, tickloc, dur):
+    for tme in model:
+        if tme.ticks_to_MB(tickloc) is not None:
+            return int(tme.ticks_per_beat*dur/tme.beat)
+    raise TimeModelError("dur_to_ticks: Cannot resolve tick %d to measure/beat reference." % tickloc)
+
+def outcome(fn, *args):
+    try:
+        return fn(*args)
+    except TimeModelError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Time TimeModel queries on a mixed-meter model.")
+    parser.add_argument('-c', '--changes', type=int, default=500, help="time-signature changes")
+    parser.add_argument('-n', '--count', type=int, default=20000, help="queries per run")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="runs; the best is reported")
+    parser.add_argument('-s', '--seed', type=int, default=1)
+    args = parser.parse_args()
+    model = stress_model(args.changes, args.seed)
+    (measures, ticks) = make_queries(model, args.count, args.seed)
+    for (m, b) in measures:
+        assert outcome(model.MB_to_ticks, m, b) == outcome(linear_MB_to_ticks, model, m, b), (m, b)
+    for tick in ticks:
+        assert outcome(model.dur_to_ticks, tick, 0.5) == outcome(linear_dur_to_ticks, model, tick, 0.5), tick
+    in_order = sorted(ticks)
+    (batch_measures, batch_beats) = model.ticks_to_MB_batch(in_order)
+    assert list(zip(batch_measures, batch_beats)) == [tuple(model.ticks_to_MB(tick)) for tick in in_order]
+    assert list(model.ticks_to_seconds_batch(in_order)) == [model.ticks_to_seconds(tick) for tick in in_order]
+    cursor = model.cursor()
+    assert [cursor.locate(tick) for tick in in_order] == \
+        [(model.ticks_to_MB(tick), model.ticks_to_seconds(tick)) for tick in in_order]
+    print("%d TMEs, %d measures, %d ticks; %d queries of each kind" %
+          (len(model), model[-1].final_measure - model[0].base_measure, model.final_tick, args.count))
+
+    cases = (("MB_to_ticks", lambda: [outcome(model.MB_to_ticks, m, b) for (m, b) in measures]),
+             ("(linear scan)", lambda: [outcome(linear_MB_to_ticks, model, m, b) for (m, b) in measures]),
+             ("dur_to_ticks", lambda: [model.dur_to_ticks(tick, 0.5) for tick in ticks]),
+             ("(linear scan)", lambda: [linear_dur_to_ticks(model, tick, 0.5) for tick in ticks]),
+             ("ticks_to_MB_batch", lambda: model.ticks_to_MB_batch(in_order)),
+             ("(per tick)", lambda: [model.ticks_to_MB(tick) for tick in in_order]),
+             ("ticks_to_seconds_batch", lambda: model.ticks_to_seconds_batch(in_order)),
+             ("(per tick)", lambda: [model.ticks_to_seconds(tick) for tick in in_order]),
+             ("cursor locate", lambda: [cursor.locate(tick) for tick in in_order]),
+             ("(per tick, both)", lambda: [(model.ticks_to_MB(tick), model.ticks_to_seconds(tick)) for tick in in_order]))
+    for (name, fn) in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print("%-24s %8.1f ms  %6.2f Mqueries/s" % (name, best * 1000, args.count / best / 1e6))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+from __future__ import print_function
+import argparse
+import random
+import re
+import timeit
+from array import array
+from itertools import chain
+from midi.util import read_varlen, read_varlen_at, write_varlen, VARLEN_BYTES
+
+"""
+Microbenchmark of the varlen (MIDI variable-length quantity) codecs in midi/util.py: the per-value
+read_varlen (iterator), read_varlen_at (offset cursor) and write_varlen against the bulk read_varlens
+and write_varlens, below.  Those work only on packed runs of varlens, which a track, its delta times
+interleaved with its events' bytes, doesn't have, so the readers and writers can't use them; they are
+kept here, as the measure of what such a bulk codec could gain.  The values are deterministic mixes
+resembling real delta times: "deltas" is mostly zero and small, with many beat-sized (two bytes) and a
+few long rests (three or four); "dense", as in chordal or controller-heavy tracks, is nearly all one-byte.  All codecs are first checked to agree.
+
+   python bench_varlen.py [-n COUNT] [-r REPEAT] [-s SEED]
+"""
+
+#Bulk decode of a packed run of varlens, data[pos:end], into an array of values, without a Python-level
+#step per value: every byte below 0x80 ends a varlen, so one regex split leaves runs of one-byte values
+#(copied as is) between the multi-byte ones, which are decoded through a memo (mostly hits: delta times
+#repeat).  A truncated last varlen is ignored.
+MULTIBYTE_VARLEN = re.compile(b'([\x80-\xff]+[\x00-\x7f])')
+HIGH_BYTES = bytes(range(0x80, 0x100))
+
+class MultibyteVarlens(dict):
+    def __missing__(self, token):
+        res = (read_varlen_at(bytearray(token), 0)[0],)  #1-tuple, to chain with the one-byte runs
+        if len(token) == 2:
+            self[token] = res
+        return res
+
+MULTIBYTE_VARLENS = MultibyteVarlens()
+
+def read_varlens(data, pos=0, end=None):
+    if end is None:
+        end = len(data)
+    pieces = MULTIBYTE_VARLEN.split(data[pos:end])
+    pieces[1::2] = map(MULTIBYTE_VARLENS.__getitem__, pieces[1::2])
+    pieces[-1] = pieces[-1].rstrip(HIGH_BYTES)
+    return array('L', chain.from_iterable(pieces))
+
+#Bulk counterpart of write_varlen: the encodings of all the values, packed.
+def write_varlens(values):
+    return b''.join(map(VARLEN_BYTES.__getitem__, values))
+
+MIXES = {"deltas": [0] * 8 + [1, 10, 30, 60, 110, 120] + [240, 480, 960, 1920] + [30000, 300000],
+         "dense": [0] * 12 + [1, 10, 30, 60, 110, 120] + [240]}
+
+def make_values(count, seed, mix="deltas"):
+    rng = random.Random(seed)
+    choices = MIXES[mix]
+    return [rng.choice(choices) for i in range(count)]
+
+def per_value_read(data):
+    it = iter(data)
+    values = []
+    try:
+        while True:
+            values.append(read_varlen(it))
+    except StopIteration:
+        pass
+    return values
+
+def per_offset_read(data):
+    values = []
+    pos = 0
+    end = len(data)
+    while pos < end:
+        (value, pos) = read_varlen_at(data, pos)
+        values.append(value)
+    return values
+
+def per_value_write(values):
+    return b''.join(bytes(write_varlen(value)) for value in values)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the per-value and bulk varlen codecs.")
+    parser.add_argument('-n', '--count', type=int, default=400000, help="values per run")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="runs; the best is reported")
+    parser.add_argument('-s', '--seed', type=int, default=1)
+    args = parser.parse_args()
+    for mix in sorted(MIXES):
+        bench_mix(mix, args)
+
+def bench_mix(mix, args):
+    values = make_values(args.count, args.seed, mix)
+    data = bytearray(per_value_write(values))
+    assert write_varlens(values) == bytes(data)
+    assert per_value_read(data) == per_offset_read(data) == list(read_varlens(data)) == values
+    print("\n%s: %d values, %d bytes encoded" % (mix, len(values), len(data)))
+
+    cases = (("read_varlen", lambda: per_value_read(data)),
+             ("read_varlen_at", lambda: per_offset_read(data)),
+             ("read_varlens (bulk)", lambda: read_varlens(data)),
+             ("write_varlen", lambda: per_value_write(values)),
+             ("write_varlens (bulk)", lambda: write_varlens(values)))
+    for (name, fn) in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print("%-22s %8.1f ms  %6.1f Mvalues/s" % (name, best * 1000, len(values) / best / 1e6))
+
+if __name__ == "__main__":
+    main()
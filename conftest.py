@@ -0,0 +1,33 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+# pytest fixtures, and helpers, shared by the test_*.py files.
+
+import ConfigMan   #first: it chooses the midi package, and insists that nothing has imported one yet
+import pytest
+
+from synth_score import synthetic_score
+
+
+#A small deterministic score (see synth_score.py) with Sysex, tempo changes and standard running status.
+@pytest.fixture(scope="session")
+def score_bytes():
+    return synthetic_score(tracks=4, events=1500, sysex_density=0.02, tempo_changes=6, seed=3)
+
+@pytest.fixture
+def score_path(tmp_path, score_bytes):
+    path = tmp_path / "score.mid"
+    path.write_bytes(score_bytes)
+    return str(path)
+
+#Events have no __eq__ (equality is identity): tests compare these.
+def event_key(event):
+    return (event.statusmsg, event.tick, getattr(event, "channel", None), list(event.data))
+
+def event_keys(events):
+    return [event_key(event) for event in events]
+
+def pattern_keys(pattern):
+    return [event_keys(track) for track in pattern]
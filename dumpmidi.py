@@ -19,8 +19,9 @@ import midi
 assert midi == ConfigMan.getMidi()
 
 from MidiTimeModel import TimeModel, build_time_model
-from midi_tool_base import dump_track_channel_content, decode_note, interpret_random_event
+from midi_tool_base import dump_track_channel_content, dump_track_status_counts, decode_note, interpret_random_event
 import incremental_read_midi as IRM
+from MidiMeasureIndex import measure_index, sidecar_path
 
 HELP_TEXT = \
 """Dump MIDI file as events, with tracks and relative ticks, and optionally
@@ -53,9 +54,9 @@ def sekey(args):
     return "seconds " * int(args.seconds)
 
 def dump_midi_file_batchily(file_path, args, tracks_to_dump):
-    pattern = midi.read_midifile(file_path)   #VB's python-midi
+    pattern = midi.read_midifile(file_path, use_mmap=args.mmap, lazy=True)   #VB's python-midi
     #These days, build_time_model can't fail; There are default time-signature and tempo.
-    time_model = build_time_model(pattern, args.starting_measure);   #BSG system, not python-midi.
+    time_model = build_time_model(pattern, args.starting_measure, as_read=True);   #BSG system, not python-midi.
     print("Resolution %d, format %d, %d tracks." % (pattern.resolution, pattern.format, len(pattern)))
 
     time_model.dump()
@@ -70,20 +71,51 @@ def dump_midi_file_batchily(file_path, args, tracks_to_dump):
         if not args.brief:
             print("")
 
-        abs_tick = 0
-        for event in track:
-            abs_tick += event.tick
-            measure = time_model.ticks_to_MB(abs_tick).measure
-            if measure < args.fromm: continue
-            if measure > args.to: break
-
+        #The measures to dump are found by bisection of the track's ticks, and only their events are decoded
+        #and converted to measure+beat (and seconds).
+        cursor = time_model.cursor()
+        for (abs_tick, event) in track.events_in_measures(args.fromm, args.to, time_model):
             if (not args.brief) and args.seconds:
-                print("%7.3f" % time_model.ticks_to_seconds(abs_tick), end = " ")
-            dump_event(abs_tick, track_number, event, time_model, args.brief)
+                print("%7.3f" % cursor.ticks_to_seconds(abs_tick), end = " ")
+            dump_event(abs_tick, track_number, event, time_model, args.brief, cursor.ticks_to_MB(abs_tick))
+
+"""
+With -I, the same dump is made through a measure index (MidiMeasureIndex.py), kept in a sidecar file next to the
+MIDI file, FILE.mindex, and remade when the file changes.  Each track is then read from the start of the --from
+measure to the end of the --to measure, and nothing else of it is read or decoded; the first such dump of a file
+scans it once to make the index.
+"""
+
+def dump_midi_file_by_index(file_path, args, tracks_to_dump):
+    index = measure_index(file_path)
+    time_model = index.time_model(args.starting_measure)
+    print("Resolution %d, format %d, %d tracks." % (index.resolution, index.format, len(index.tracks)))
+
+    time_model.dump()
+    if args.seconds:
+        time_model.dump_tempo()
+
+    print("\n" + sekey(args) + _short_key)
+    #The index numbers measures from 0.
+    (first, last) = (args.fromm - args.starting_measure, args.to - args.starting_measure)
+    with open(file_path, "rb") as f:
+        for (track_number, track) in enumerate(index.tracks):
+            dump_track_status_counts(track_number, track["status_counts"])
+            if tracks_to_dump and track_number not in tracks_to_dump:
+                continue
+            if args.brief:
+                continue
+            print("")
+            cursor = time_model.cursor()
+            for (abs_tick, event) in index.events_in_measures(f, track_number, first, last):
+                if args.seconds:
+                    print("%7.3f" % cursor.ticks_to_seconds(abs_tick), end = " ")
+                dump_event(abs_tick, track_number, event, time_model, args.brief, cursor.ticks_to_MB(abs_tick))
 
 #Shared event-dumper. Note that address/length in batch mode is already printed without a newline.
-def dump_event(abs_tick, track_number, event, time_model, brief):
-    measure_beat = time_model.ticks_to_MB(abs_tick)
+def dump_event(abs_tick, track_number, event, time_model, brief, measure_beat=None):
+    if measure_beat is None:
+        measure_beat = time_model.ticks_to_MB(abs_tick)
     if isinstance(event, midi.NoteEvent):
         vel = event.velocity
         if not brief:
@@ -113,13 +145,39 @@ def dump_event(abs_tick, track_number, event, time_model, brief):
 """
 This is the incremental descent of the future-laden MIDI tree.  It differs from the standard, synchronous, one
 only in its need to retrieve raw python-midi objects from their IRM wrappers; the iterations are identical.
-Also, the time model is maintained incrementally during the first track.
+The time model, as build_time_model's, takes time signatures and tempi from every track, so it is made first, in
+a pass of its own over the file that stops quietly where the dump will stop (and report) if the file is bad.
 """
 
-def dump_midi_file_incrementally(file_path, args, hexfile):
-
-    midi_header = IRM.AsyTreeFileReader().access(file_path)   #Our header structure; python-midi's isn't needed
-    time_model = TimeModel(midi_header.resolution,starting_measure=args.starting_measure)
+def incremental_time_model(file_path, args):
+    reader = IRM.AsyTreeFileReader()
+    midi_header = reader.access(file_path, use_mmap=args.mmap)
+    conductor_map = midi.ConductorMap()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   #the dump gives them
+        for track in midi_header.tracks:
+            abs_tick = 0
+            events = []
+            try:
+                for item in track.events:
+                    abs_tick += item.event.tick
+                    if isinstance(item.event, midi.CONDUCTOR_EVENT_CLASSES):
+                        events.append((abs_tick, item.event))
+            except Exception:
+                conductor_map.add_track(events, abs_tick)
+                break
+            conductor_map.add_track(events, abs_tick)
+    time_model = TimeModel(midi_header.resolution, starting_measure=args.starting_measure)
+    for (tick, event) in conductor_map.events():
+        time_model.process_dynamic_event(tick, event)
+    time_model.finish(conductor_map.end_tick)
+    return time_model
+
+def dump_midi_file_incrementally(file_path, args):
+
+    time_model = incremental_time_model(file_path, args)
+    reader = IRM.AsyTreeFileReader()
+    midi_header = reader.access(file_path, use_mmap=args.mmap)   #Our header structure; python-midi's isn't needed
 
     print("%d tracks. Resolution=%d, format %d" % (midi_header.n_tracks, midi_header.resolution, midi_header.format))
     if not args.brief:
@@ -131,35 +189,31 @@ def dump_midi_file_incrementally(file_path, args, hexfile):
         print ("TRACK    %d @ byte %d, byte length %d" % (track_number, track.address, track.length))
 
         abs_tick = 0
+        cursor = time_model.cursor()
         for item in track.events:      #extract "event list" (actually, "event-generator") from wrapper ...
             event = item.event         #extract python-midi event from wrapper ...
             abs_tick += event.tick     #have to account rel/abs ticks no matter how events are obtained....
 
-            #Incremental accumulation of tempo and time-signature models is now possible!
-            #At least with my files, these events only occur in track 0.
-            if track_number == 0 and isinstance(event, (midi.TimeSignatureEvent, midi.SetTempoEvent)):
-                time_model.process_dynamic_event(abs_tick, event)
-
-            if not args.fromm <= time_model.ticks_to_MB(abs_tick).measure <= args.to:
+            measure_beat = cursor.ticks_to_MB(abs_tick)
+            if not args.fromm <= measure_beat.measure <= args.to:
                 continue
 
             #Prefix address and length to each line before dumping it if opted.
             if not args.brief:
                 if args.seconds:
-                    print("%7.3f" % time_model.ticks_to_seconds(abs_tick), end = " ")
+                    print("%7.3f" % cursor.ticks_to_seconds(abs_tick), end = " ")
                 print("%4d %2d" % (item.address, item.length), end = "  ")
 
-            dump_event(abs_tick, track_number, event, time_model, args.brief)
-            if args.hex:
-                hexfile.seek(item.address, 0)
-                data = ["%02X" % int(c) for c in hexfile.read(item.length)]
+            dump_event(abs_tick, track_number, event, time_model, args.brief, measure_beat)
+            if args.hex:   #out of the reader's own buffer (or map)
+                data = ["%02X" % int(c) for c in reader.file_iterator.bytes_at(item.address, item.length)]
                 print("   %4d      %s" % (item.address, " ".join(data)))
 
-def check_midi_file(file_path):
+def check_midi_file(file_path, use_mmap=False):
     reader = IRM.AsyTreeFileReader()
     if not hasattr(reader,"has_running_status_errors"):
         raise RuntimeError("This version of the MIDI package doesn't support running status error testing.")
-    midi_header =  reader.access(file_path)
+    midi_header =  reader.access(file_path, use_mmap=use_mmap)
     warnings.filterwarnings('ignore')
     for track in midi_header.tracks:
         for item in track.events:
@@ -178,7 +232,9 @@ def parse_and_validate_args():
     aa('-b', '--brief', action="store_true", help="Only show track summaries, no notes or other events.")
     aa('-c', '--check', action="store_true", help="Check file for Status Byte cancellation failures. Reports, and returns error status to shell if present.")
     aa('-f', '--from', dest="fromm", metavar="meas#", type=int, default=0, help="First measure number to dump.")
+    aa('-I', '--index', action="store_true", help="Seek straight to --from/--to measures through a measure index, kept in FILE.mindex (made if need be).")
     aa('-i', '--incremental', action="store_true", help="Read file (possibly malformed) incrementally, additionally displaying event addresses and lengths.")
+    aa('-M', '--mmap', action="store_true", help="Read the file through a memory map instead of reading it in.")
     aa('-m', '--measure', dest="starting_measure", metavar="meas#", default=1, type=int, help="Number of first measure in file, default 1, which is wrong for upbeats.")
     aa('-s', '--seconds', action="store_true", help="Show real-time seconds pos. of each event.")
     aa('-t', '--to', type=int, default=BIG_MEASURE,metavar="meas#", help="Last measure number to dump.")
@@ -196,6 +252,8 @@ def parse_and_validate_args():
         argerr("--from/--to/--track cannot be used with --check or --brief.")
     if args.Track and args.incremental:
         argerr("Cannot select specific tracks in incremental (-i) mode.")
+    if args.index and (args.incremental or args.check):
+        argerr("--index cannot be used with --incremental or --check.")
     return args
 
 def main():
@@ -220,7 +278,7 @@ def main():
 
 
     if args.check:
-        if check_midi_file(absp):
+        if check_midi_file(absp, args.mmap):
             print("OK:     %s has no status byte problems." % absp)
             sys.exit(0)
         else:
@@ -228,11 +286,10 @@ def main():
             sys.exit(2)
     elif args.incremental:
         print("Decoding in incremental mode.\n")
-        if args.hex:
-            with open(file_path, "rb") as hexfile:
-                dump_midi_file_incrementally(file_path, args, hexfile)
-        else:
-                dump_midi_file_incrementally(file_path, args, None)
+        dump_midi_file_incrementally(file_path, args)
+    elif args.index:
+        print("Decoding in batch mode, through measure index %s.\n" % sidecar_path(absp))
+        dump_midi_file_by_index(absp, args, tracks_to_dump)
     else:
         print("Decoding in batch mode.\n")
         dump_midi_file_batchily(file_path, args, tracks_to_dump)
@@ -9,6 +9,8 @@ import sys
 assert(sys.version_info[0] >= 3) #2/3/2024
 
 import midi
+import mmap
+import warnings
 from collections import namedtuple
 
 """
@@ -25,8 +27,8 @@ These classes exploit VB's header-reading and event-construction methods (some o
 object, and others a byte-producing iterator--hence, we have to construct such iterators with additional functionality).
 We shadow his top-level and track-walking methods in order to return structures that contain unfulfilled generators
 for their next-level contents instead of lists, allowing descent/iteration almost (there are wrapper structures) identical to
-that for for walking VB's tree, but which are fed by a supplier which has not read a single byte beyond the nodes that have
-up to that point been pulled from it.
+that for for walking VB's tree, but which are fed by a supplier which has not parsed a single byte beyond the nodes that have
+up to that point been pulled from it (it reads ahead, in chunks, only into its buffer).
 
 by BSG  week of 13-19 Aug 2017
 """
@@ -38,37 +40,50 @@ Track   = namedtuple("Track", ("index", "address", "length", "events"))
 Event   = namedtuple("Event", ("address", "length", "running_status", "event"))
 
 #Private iterator class for indexables that allows asking about "pos" (tell()).
+#start/end select a window of S (e.g., one track of a mapped file) without copying it; tell() is window-relative.
 class TellableArrayIterator(object): #next vs __next__
-    def __init__(self, S):
+    def __init__(self, S, start=0, end=None):
         self.S = S
-        self.pos = 0
+        self.start = start
+        self.end = len(S) if end is None else end
+        self.pos = start
     def __iter__(self):
-        self.pos = 0
+        self.pos = self.start
         return self
     def __next__(self):
-        if self.pos >= len(self.S):
+        if self.pos >= self.end:
             raise(StopIteration)
         else:
             v = self.S[self.pos]
             self.pos += 1
             return v
     def tell(self):
-        return self.pos
+        return self.pos - self.start
 
 
 #This class is the earlier "stabat" this, returning a single yield stream of intermixed types which must be selected by type.
 
 class AsyFileReader(midi.FileReader):
     #Generator method returning intermixed items, including those produced by asyparse_track.
-    def asyread(self, midifile_path):
+    #With use_mmap, tracks are iterated in place in a memory map of the file rather than read out of it.
+    def asyread(self, midifile_path, use_mmap=False):
         with open(midifile_path, "rb") as midifile:
-            header = self.parse_file_header(midifile)
-            n_tracks = len(header)
-            yield Header(header.resolution, header.format, n_tracks, None)
-            for track_number in range(n_tracks):
-                for item in self.asyparse_track(midifile, track_number):
+            if use_mmap:
+                with mmap.mmap(midifile.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                    for item in self.asyread_1(mapping):
+                        yield item
+            else:
+                for item in self.asyread_1(midifile):
                     yield item
 
+    def asyread_1(self, midifile):
+        header = self.parse_file_header(midifile)
+        n_tracks = len(header)
+        yield Header(header.resolution, header.format, n_tracks, None)
+        for track_number in range(n_tracks):
+            for item in self.asyparse_track(midifile, track_number):
+                yield item
+
     #Generator method returning intermixed track and event items
     def asyparse_track(self, midifile, track_number):
         self.RunningStatus = None
@@ -76,7 +91,12 @@ class AsyFileReader(midi.FileReader):
         track_length = self.parse_track_header(midifile)
         yield Track(track_number, track_base, track_length, None)
         data_base_addr = midifile.tell()
-        track_data = TellableArrayIterator(midifile.read(track_length))
+        if isinstance(midifile, mmap.mmap):
+            data_end_addr = min(data_base_addr + track_length, len(midifile))
+            track_data = TellableArrayIterator(midifile, data_base_addr, data_end_addr)
+            midifile.seek(data_end_addr)
+        else:
+            track_data = TellableArrayIterator(midifile.read(track_length))
         while True:
             try:
                 event_offset = track_data.tell()
@@ -86,29 +106,56 @@ class AsyFileReader(midi.FileReader):
             except StopIteration:
                 break
 
+#The file is read in CHUNK-sized pieces into a buffer that bytes are then taken from, not read(1) per byte; the file
+#position is thus ahead of tell(), which is only ever this iterator's.  A refill keeps the last KEEP bytes before
+#pos, so that bytes_at can usually supply a just-parsed event from the buffer.
 class RechargeableFileCharacterIterator(object): #next vs __next__
+    CHUNK = 0x10000
+    KEEP = 0x1000
+
     def __init__(self, file):
         self.file = file
         self.pos = 0  #file-absolute
         self.flen = self.file.seek(0,2) #EOF
         self.file.seek(self.pos,0)
         self.limit = self.flen
+        self.buf = b''
+        self.buf_base = 0    #file address of buf[0]; buf_base + len(buf) is the file's own position
 
     #Recharge with a new, limited-length "view" into the file
     def set_view(self, length):
-        self.pos = self.file.tell()    #pos is file-absolute
-        self.limit = self.pos + length #as is self.limit
-        
+        self.limit = self.pos + length #pos and limit are file-absolute
+
     def __iter__(self):
         return self
 
     def __next__(self):
-        if self.eofp():
+        if self.pos >= self.limit:
             raise(StopIteration)
-        else:
-            v = self.file.read(1)[0]
-            self.pos += 1  #should match file position
-            return v
+        i = self.pos - self.buf_base
+        if i >= len(self.buf):
+            if not self.fill(1):       #truncated file; let event_list_gen report it
+                raise(StopIteration)
+            i = self.pos - self.buf_base
+        self.pos += 1
+        return self.buf[i]
+
+    #Make at least n bytes from pos available in buf, if the file has them; false if it hasn't.
+    def fill(self, n):
+        keep = max(0, self.pos - self.buf_base - self.KEEP)
+        self.buf = self.buf[keep:] + self.file.read(max(n, self.CHUNK))
+        self.buf_base += keep
+        return self.pos - self.buf_base + n <= len(self.buf)
+
+    #File-like read, so VB's header parsers can be fed from here, too.
+    def read(self, n):
+        i = self.pos - self.buf_base
+        if i + n > len(self.buf):
+            self.fill(n)
+            i = self.pos - self.buf_base
+        data = self.buf[i:i + n]
+        self.pos += len(data)
+        return data
 
     #Always in total file.
     def tell(self):
@@ -118,15 +165,72 @@ class RechargeableFileCharacterIterator(object): #next vs __next__
     def eofp(self):
         return self.pos >= self.limit
 
+    #(data, index of pos in it, index of the end, whole?) with at least n bytes from pos in data, if the view and the
+    #file have them; the end is that of the view, or of the file ("whole"), if buffered, else of the buffer.
+    def window(self, n):
+        if self.pos - self.buf_base + n > len(self.buf):
+            self.fill(n)
+        buf_end = self.buf_base + len(self.buf)
+        if self.limit <= buf_end:
+            return (self.buf, self.pos - self.buf_base, self.limit - self.buf_base, True)
+        return (self.buf, self.pos - self.buf_base, len(self.buf), buf_end >= self.flen)
+
+    #The bytes at a file address already passed (an Event's, for a hex dump), from the buffer if it still has them.
+    def bytes_at(self, address, length):
+        i = address - self.buf_base
+        if i >= 0 and i + length <= len(self.buf):
+            return self.buf[i:i + length]
+        self.file.seek(address, 0)
+        data = self.file.read(length)
+        self.file.seek(self.buf_base + len(self.buf), 0)
+        return data
+
+#Same protocol over a memory map of the file: bytes are indexed in place, no reads or seeks.
+class MappedFileCharacterIterator(RechargeableFileCharacterIterator):
+    def __init__(self, mapping):
+        self.file = mapping
+        self.pos = 0
+        self.flen = len(mapping)
+        self.limit = self.flen
+
+    def set_view(self, length):
+        self.limit = self.pos + length
+
+    def __next__(self):
+        if self.pos >= self.limit or self.pos >= self.flen:
+            raise(StopIteration)
+        else:
+            v = self.file[self.pos]
+            self.pos += 1
+            return v
+
+    def read(self, n):
+        data = self.file[self.pos:self.pos + n]
+        self.pos += len(data)
+        return data
+
+    def window(self, n):
+        return (self.file, self.pos, min(self.limit, self.flen), True)
+
+    def bytes_at(self, address, length):
+        return self.file[address:address + length]
+
 #This class is the second attempt, which returns a proper tree of nested generators, permitting the caller to be
 #written isomorphically to one processing via recursive descent a pre-read tree
 
 class AsyTreeFileReader(midi.FileReader):
     #Synchronous method returning a structure containing Track generator
-    def access(self, midifile_path):
+    #With use_mmap, the file is read through a memory map instead of a byte at a time.
+    def access(self, midifile_path, use_mmap=False):
         self.file = open(midifile_path, "rb") #don't use "with" because of coroutinity; this fcn ends too soon to close.
-        self.file_iterator = RechargeableFileCharacterIterator(self.file)
-        header = self.parse_file_header(self.file)  #VB calls it "pattern"
+        if use_mmap:
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.file_iterator = MappedFileCharacterIterator(self.mapping)
+        else:
+            self.mapping = None
+            self.file_iterator = RechargeableFileCharacterIterator(self.file)
+        self.held_warnings = []   #see next_event
+        header = self.parse_file_header(self.file_iterator)  #VB calls it "pattern"
         n_tracks = len(header)  #VB header ("pattern") is built on "list".
         return Header(header.resolution, header.format, n_tracks, self.track_gen(n_tracks))
 
@@ -134,13 +238,15 @@ class AsyTreeFileReader(midi.FileReader):
     def track_gen(self, n_tracks):
         for track_number in range(n_tracks):
             yield self.parse_track(track_number)
+        if self.mapping is not None:
+            self.mapping.close()
         self.file.close()
 
     #Synchronous method returning a structure containing Event generator
     def parse_track(self, track_number):
         self.RunningStatus = None  #Lower level needs this.
-        track_base = self.file.tell()
-        track_length = self.parse_track_header(self.file)
+        track_base = self.file_iterator.tell()
+        track_length = self.parse_track_header(self.file_iterator)
         self.file_iterator.set_view(track_length)
         return Track(track_number, track_base, track_length, self.event_list_gen())
 
@@ -150,8 +256,45 @@ class AsyTreeFileReader(midi.FileReader):
             try:
                 address = self.file_iterator.tell()
                 running_status = self.RunningStatus
-                event = self.parse_midi_event(self.file_iterator)
+                event = self.next_event(self.file_iterator)
                 yield Event(address, self.file_iterator.tell() - address, running_status, event)
             except StopIteration:
                 raise RuntimeError("Track and Event ran out of data prematurely at pos %d, last event @ %d" % \
-                                   (self.file.tell(), address)) #address can't not be set.
+                                   (self.file_iterator.tell(), address)) #address can't not be set.
+
+    #Events are parsed by offset (the batch reader's parse_midi_event_at) out of the iterator's window on its
+    #buffer (or map), widened while an event runs past it.  Only an event that fails to parse in the whole
+    #rest of the view, truncated or bad, is parsed again a byte at a time, to stop, or fail, just as before.
+    #An attempt that fails is undone: the running status it changed is put back, and its warnings (held back
+    #by warn, below, until the event is had) are dropped, so each is given once, by the attempt that succeeds.
+    def next_event(self, file_iterator):
+        want = 0x100
+        held = self.held_warnings   #empty between events
+        state = (self.RunningStatus, self.last_event_class, self.RSCompat_reported)
+        while True:
+            (data, pos, end, whole) = file_iterator.window(want)
+            try:
+                (event, npos) = self.parse_midi_event_at(data, pos, end)
+                if npos <= end:
+                    file_iterator.pos += npos - pos
+                    if held:
+                        self.give_warnings()
+                    return event
+            except (IndexError, RuntimeError):
+                pass
+            (self.RunningStatus, self.last_event_class, self.RSCompat_reported) = state
+            del held[:]
+            if whole:
+                try:
+                    return self.parse_midi_event(file_iterator)
+                finally:
+                    self.give_warnings()   #given, as before, even if it stops there
+            want *= 16
+
+    def warn(self, message, category=UserWarning):
+        self.held_warnings.append((message, category))
+
+    def give_warnings(self):
+        for (message, category) in self.held_warnings:
+            warnings.warn(message, category)
+        del self.held_warnings[:]
@@ -97,6 +97,7 @@ class Converter(collision.mixin,ConverterBase):
         self.use_soft_general_cancel = SOFT_GENERAL_CANCEL_DEFAULT
         self.use_hard_general_cancel = HARD_GENERAL_CANCEL_DEFAULT
         self.hoisted_events = [ ]
+        self.merge_on_write = False
         self.event_map = {StopEvent: self.do_stop_event,
                           RoutingEvent: self.do_routing_event,
                           ExpressionEvent: self.do_expression_event}
@@ -194,13 +195,14 @@ class Converter(collision.mixin,ConverterBase):
         div = self.routings[tx]
         octave_disp = self.octave_disps.get(tx, 0)
         new_track = midi.Track(tick_relative=False)
+        cursor = self.time_model.cursor()
         for event in old_track:
             if isinstance(event, midi.NoteEvent):
                 if routing_events.mature(event.tick):
                     div = self.handle_reroutes(routing_events, event.tick, tx, onmap) or div
                 self.manage_onmap(event, onmap)
                 if self.args.notes:
-                    display_note_event(event, self.ticks_to_MB)
+                    display_note_event(event, cursor.ticks_to_MB)
                 new_track.append(event.copy(pitch=event.pitch + octave_disp, channel=div.channel))
             elif isinstance(event, midi.TimeSignatureEvent):
                 pass #ignorem
@@ -254,9 +256,23 @@ class Converter(collision.mixin,ConverterBase):
 
     def insert_prologues(self):
         if not self.orgdef.needs_prologue:
+            if self.merge_on_write:
+                self.insert_merged_prologue()
+                return
             for tx,t in enumerate(self.midi_data):
                 assert t.tick_relative
                 self.insert_signatures(tx, t)
+
+    #Into track 0, and the other tracks delayed as much, as though at the start of the merged track.
+    def insert_merged_prologue(self):
+        track = self.midi_data[0]
+        before = len(track)
+        self.insert_signatures(0, track)
+        delay = sum(event.tick for event in track[:len(track) - before])
+        for other in self.midi_data[1:]:
+            assert other.tick_relative
+            if len(other):
+                other[0].tick += delay
     
     def expand_relative_path(self, path):
         if path.startswith("/"):
@@ -462,38 +478,52 @@ class Converter(collision.mixin,ConverterBase):
         if not wanted_track_numbers:
             print(ConverterBase.REDify("No non-organ tracks. Not writing not-organ MIDI."))
             return
-        new_midi = midi.Pattern(resolution=self.midi_data.resolution,tick_relative=True)
+        #The premunged tracks (a copy already, made for this) are streamed out as they are: the writer changes
+        #no event, so no further copy of the piece is made.
+        new_tracks = []
         if 0 not in wanted_track_numbers:
-            new_midi.append(self.copy_track_nd_rel(self.create_track_0(midi_data[0])))
+            new_tracks.append(self.copy_track_nd_rel(self.create_track_0(midi_data[0])))
         for i in sorted(wanted_track_numbers):
             assert self.premunged_data[i].tick_relative
-            new_midi.append(self.copy_track_nd_any(self.premunged_data[i]))
+            new_tracks.append(self.premunged_data[i])
 
         path = self.expand_relative_path(self.NoOrganOutputPath)
-        midi.write_midifile(path, new_midi)
+        midi.write_midifile_streaming(path, new_tracks, resolution=self.midi_data.resolution)
         print("Wrote non-organ MIDI %s, %d staves, %d bytes." % \
                 (path, len(wanted_track_numbers), os.path.getsize(path)))
             
     def heart_of_merge(self, first_index):
         for t in self.midi_data:
             assert not t.tick_relative
-        chaingen = itertools.chain(*(self.midi_data[first_index:]))
-        new_track = sorted(chaingen, key=attrgetter("tick")) # all in order merged
-        return midi.Track(filter(lambda e: not isinstance(e, midi.EndOfTrackEvent), new_track),tick_relative=False)
+        return midi.Track(self.merged_events(first_index), tick_relative=False)
+
+    #Heap merge of the (each time-ordered) tracks, ties to the earlier track; no merged list is built.
+    def merged_events(self, first_index):
+        return (event for (tick, event) in midi.merge_timed_events(self.midi_data[first_index:])
+                if not isinstance(event, midi.EndOfTrackEvent))
 
     def cap_track(self, track):
         assert track.tick_relative
         track.append(midi.EndOfTrackEvent(tick=1))
 
+    #The tracks stay as they are until written, when write_midifile_merged merges them as it goes into
+    #the one track of a format 0 file, capped as cap_track would.
     def merge_tracks(self):
         print("Collapsing %d tracks into one." % len(self.midi_data))
         assert self.midi_data[0].tick_relative
-        self.midi_data.make_ticks_abs() # will check-assert abs
-        self.midi_data = midi.Pattern(resolution=self.midi_data.resolution,
-                                      format = 0, tick_relative = False,
-                                      tracks = [self.heart_of_merge(0)])
-        self.midi_data.make_ticks_rel()
-        self.cap_track(self.midi_data[0])
+        self.merge_on_write = True
+
+    def report_all_tracks(self):
+        if self.merge_on_write:
+            self.report_midi_track(0, itertools.chain(self.merged_events(0), [midi.EndOfTrackEvent(tick=1)]))
+        else:
+            ConverterBase.report_all_tracks(self)
+
+    def write_midi_data(self, target):
+        if self.merge_on_write:
+            midi.write_midifile_merged(target, self.midi_data, self.midi_data.resolution)
+        else:
+            ConverterBase.write_midi_data(self, target)
 
     def division_partition_tracks(self):
         assert self.midi_data[0].tick_relative
@@ -501,7 +531,7 @@ class Converter(collision.mixin,ConverterBase):
         tkbychan = {}
         for div in self.orgdef.get_speaking_divisions():
             tkbychan[div.channel] = midi.Track(tick_relative=False)
-        for event in self.heart_of_merge(1):
+        for event in self.merged_events(1):  #ticks absolute, as the partitioned tracks want them
             assert not isinstance(event, midi.SysexEvent),"Shouldn't be copying Sysex"
             if isinstance(event, midi.TimeSignatureEvent):
                 for (cno, evs) in tkbychan.items():
@@ -12,3 +12,5 @@ from events import *
 from struct import unpack, pack
 from util import *
 from fileio import *
+from lazytrack import *
+from columnar import *
@@ -0,0 +1,243 @@
+#For BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard Greenberg
+#Offered according to GNU Public License Version 3
+#See LICENSE in project directory.
+#
+
+from array import array
+from collections import Counter
+from itertools import accumulate, chain, compress
+from operator import sub
+from containers import *
+from events import *
+
+"""
+Columnar ("struct of arrays") alternative to Track, for bulk passes over very large scores.  Instead of a list of
+event objects, each with its own dict and data list, a ColumnarTrack keeps one typed array per field:
+
+   tick     delta or absolute tick, per tick_relative, as in Track
+   status   status byte with channel masked out (0x80-0xE0), 0xFF for Meta events, 0xF0 for Sysex
+   channel  channel of general messages, 0 otherwise
+   data1    first data byte of general messages, metacommand of Meta events
+   data2    second data byte of two-byte general messages
+
+Variable-length payloads (Meta and Sysex data, and any general message whose data isn't its class's standard
+length) go in a side table keyed by row.  Event objects are only built when a row is indexed or iterated, and
+are detached copies: changing one does not change the columns (assign it back to do that).  Channel counts and
+filtering run as C-level array/itertools passes rather than per-event Python code, and tick mode switches, once
+both tick columns have been worked out (tick_columns), exchange one column for the other, changing nothing.
+(This is ColumnarTrack's alone: a Track's events carry their own ticks, which a switch must set one by one.)
+(The stdlib "array" module is used so as not to add a dependency; numpy.frombuffer can adopt the columns as is.)
+"""
+
+STATUS_META = MetaEvent.statusmsg
+STATUS_SYSEX = SysexEvent.statusmsg
+
+
+class ColumnarTrack(object):
+    def __init__(self, events=[], tick_relative=True):
+        self.tick_relative = tick_relative
+        self.tick = array('q')
+        self.status = array('B')
+        self.channel = array('B')
+        self.data1 = array('B')
+        self.data2 = array('B')
+        self.payload = {}   #row -> data list, for the variable-length
+        self._tick_columns = None
+        for event in events:
+            self.append(event)
+
+    @staticmethod
+    def from_track(track):
+        return ColumnarTrack(track, tick_relative=track.tick_relative)
+
+    def to_track(self):
+        return Track(iter(self), tick_relative=self.tick_relative)
+
+    def append(self, event):
+        row = len(self.tick)
+        data = event.data
+        if isinstance(event, MetaEvent):
+            status = STATUS_META
+            channel = 0
+            d1 = event.metacommand
+            d2 = 0
+            self.payload[row] = data[:]
+        elif isinstance(event, SysexEvent):
+            status = STATUS_SYSEX
+            channel = d1 = d2 = 0
+            self.payload[row] = data[:]
+        elif isinstance(event, Event):
+            status = event.statusmsg
+            channel = event.channel
+            if len(data) == event.length and len(data) <= 2:
+                d1 = data[0] if len(data) > 0 else 0
+                d2 = data[1] if len(data) > 1 else 0
+            else:
+                d1 = d2 = 0
+                self.payload[row] = data[:]
+        else:
+            raise ValueError("Unknown MIDI Event: " + str(event))
+        self._tick_columns = None
+        self.tick.append(event.tick)
+        self.status.append(status)
+        self.channel.append(channel)
+        self.data1.append(d1)
+        self.data2.append(d2)
+
+    def __len__(self):
+        return len(self.tick)
+
+    def __iter__(self):
+        for row in range(len(self.tick)):
+            yield self.event_at(row)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.copy_rows(range(*item.indices(len(self))))
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("ColumnarTrack index out of range")
+        return self.event_at(item)
+
+    def __setitem__(self, row, event):
+        if row < 0:
+            row += len(self)
+        tail = ColumnarTrack([event])
+        self._tick_columns = None
+        self.tick[row] = tail.tick[0]
+        self.status[row] = tail.status[0]
+        self.channel[row] = tail.channel[0]
+        self.data1[row] = tail.data1[0]
+        self.data2[row] = tail.data2[0]
+        self.payload.pop(row, None)
+        if 0 in tail.payload:
+            self.payload[row] = tail.payload[0]
+
+    #Materialize one row as a regular event object.
+    def event_at(self, row):
+        status = self.status[row]
+        tick = self.tick[row]
+        if status == STATUS_META:
+            cmd = self.data1[row]
+            cls = EventRegistry.MetaEvents.get(cmd, UnknownMetaEvent)
+            return cls(tick=tick, data=self.payload[row][:], metacommand=cmd)
+        elif status == STATUS_SYSEX:
+            return SysexEvent(tick=tick, data=self.payload[row][:])
+        cls = EventRegistry.Events[status]
+        if row in self.payload:
+            data = self.payload[row][:]
+        elif cls.length == 2:
+            data = [self.data1[row], self.data2[row]]
+        else:
+            data = [self.data1[row]][:cls.length]
+        return cls(tick=tick, channel=self.channel[row], data=data)
+
+    #New ColumnarTrack of the given rows, their ticks copied as they are, as slicing a Track copies its events.
+    def copy_rows(self, rows):
+        rows = list(rows)
+        return self.of_rows(rows, array('q', map(self.tick.__getitem__, rows)))
+
+    #New ColumnarTrack of the given rows (ascending) that keeps each event's time: in relative ticks, the deltas
+    #are remade between the rows taken, the first from the start of the track.
+    def take(self, rows):
+        rows = list(rows)
+        if self.tick_relative:
+            ticks = self.abs_ticks()
+            ticks = array('q', map(ticks.__getitem__, rows))
+            return self.of_rows(rows, array('q', map(sub, ticks, chain((0,), ticks))))
+        return self.copy_rows(rows)
+
+    def of_rows(self, rows, ticks):
+        new = ColumnarTrack(tick_relative=self.tick_relative)
+        new.tick = ticks
+        for name in ("status", "channel", "data1", "data2"):
+            setattr(new, name, array('B', map(getattr(self, name).__getitem__, rows)))
+        if self.payload:
+            new.payload = {i: self.payload[row] for (i, row) in enumerate(rows) if row in self.payload}
+        return new
+
+    def select(self, mask):
+        return self.take(compress(range(len(self)), mask))
+
+    #Rows whose status (0x90 for Note On, STATUS_META, etc.) is among those given.
+    def filter_status(self, *statuses):
+        return self.select(map(frozenset(statuses).__contains__, self.status))
+
+    def abs_ticks(self):
+        if self.tick_relative:
+            return array('q', self.tick_columns()[1])
+        return self.tick
+
+    def rel_ticks(self):
+        if self.tick_relative:
+            return self.tick
+        return array('q', self.tick_columns()[0])
+
+    def make_ticks_abs(self):
+        if self.tick_relative:
+            self.tick = self.tick_columns()[1]
+            self.tick_relative = False
+
+    def make_ticks_rel(self):
+        if not self.tick_relative:
+            self.tick = self.tick_columns()[0]
+            self.tick_relative = True
+
+    #Both tick columns, (delta, absolute), one of them the live tick column itself, kept from when the other was
+    #last worked out: a mode switch then just makes the other the live one, in O(1), and leaves both kept.  The
+    #track's own changes (append, __setitem__) drop them, as does assigning it a new tick column; a change made
+    #to the tick column in place can't be seen, so make it through the track.
+    def tick_columns(self):
+        columns = self._tick_columns
+        if columns is None or columns[not self.tick_relative] is not self.tick:
+            live = self.tick
+            if self.tick_relative:
+                columns = (live, array('q', accumulate(live)))
+            else:
+                columns = (array('q', map(sub, live, chain((0,), live))), live)
+            self._tick_columns = columns
+        return columns
+
+    #Counter of channel -> number of general messages, optionally only those of the given statuses.
+    def channel_counts(self, *statuses):
+        if statuses:
+            mask = map(frozenset(statuses).__contains__, self.status)
+        else:
+            mask = map(STATUS_SYSEX.__gt__, self.status)
+        return Counter(compress(self.channel, mask))
+
+    def __repr__(self):
+        return "midi.ColumnarTrack(%d events, tick_relative=%r)" % (len(self), self.tick_relative)
+
+
+class ColumnarPattern(list):
+    def __init__(self, tracks=[], resolution=220, format=1, tick_relative=True):
+        self.format = format
+        self.resolution = resolution
+        self.tick_relative = tick_relative
+        super(ColumnarPattern, self).__init__(tracks)
+
+    @staticmethod
+    def from_pattern(pattern):
+        return ColumnarPattern(tracks=map(ColumnarTrack.from_track, pattern), resolution=pattern.resolution,
+                               format=pattern.format, tick_relative=pattern.tick_relative)
+
+    def to_pattern(self):
+        return Pattern(tracks=[track.to_track() for track in self], resolution=self.resolution,
+                       format=self.format, tick_relative=self.tick_relative)
+
+    def make_ticks_abs(self):
+        self.tick_relative = False
+        for track in self:
+            track.make_ticks_abs()
+
+    def make_ticks_rel(self):
+        self.tick_relative = True
+        for track in self:
+            track.make_ticks_rel()
+
+    def __repr__(self):
+        return "midi.ColumnarPattern(format=%r, resolution=%r, %d tracks)" % \
+            (self.format, self.resolution, len(self))
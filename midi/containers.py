@@ -5,18 +5,20 @@
 #See LICENSE in project directory.
 #
 
+import heapq
+from bisect import bisect_left
+from collections.abc import Sequence
+from copy import deepcopy
 from pprint import pformat, pprint
-
-try:
-    xrange
-except NameError:
-    xrange=range
+from itertools import accumulate, chain, tee
+from operator import attrgetter, itemgetter, sub
 
 class Pattern(list):
     def __init__(self, tracks=[], resolution=220, format=1, tick_relative=True):
         self.format = format
         self.resolution = resolution
         self.tick_relative = tick_relative
+        self.conductor_map = None    #set by FileReader (see ConductorMap)
         super(Pattern, self).__init__(tracks)
 
     def __repr__(self):
@@ -35,9 +37,8 @@ class Pattern(list):
 
     def __getitem__(self, item):
         if isinstance(item, slice):
-            indices = item.indices(len(self))
-            return Pattern(resolution=self.resolution, format=self.format,
-                            tracks=(super(Pattern, self).__getitem__(i) for i in xrange(*indices)))
+            return Pattern(resolution=self.resolution, format=self.format, tick_relative=self.tick_relative,
+                            tracks=super(Pattern, self).__getitem__(item))
         else:
             return super(Pattern, self).__getitem__(item)
 
@@ -46,6 +47,39 @@ class Pattern(list):
         # for calls of the form List[i:j]
         return self.__getitem__(slice(i,j))
 
+    #(absolute tick, track number, event) of every track's events_between(t0, t1), in tick order; at the same tick,
+    #earlier tracks' first.
+    def events_between(self, t0, t1):
+        def numbered(track_number, track):
+            for (tick, event) in track.events_between(t0, t1):
+                yield (tick, track_number, event)
+        return heapq.merge(*[numbered(tx, track) for (tx, track) in enumerate(self)], key=itemgetter(0))
+
+    def events_in_measures(self, first, last, time_model):
+        return self.events_between(time_model.measure_start_tick(first), time_model.measure_start_tick(last + 1))
+
+#The tempo and time-signature events of every track of a Pattern, with their absolute ticks, and each track's length
+#in ticks, collected by FileReader as it parses the tracks, so that MidiTimeModel.build_time_model needs no further
+#pass over the events.  It describes the tracks as they were read, so build_time_model uses it only when its caller
+#says (as_read=True) that the pattern is still as it was read.
+class ConductorMap(object):
+    def __init__(self):
+        self.track_events = []    #per track, (absolute tick, event) in order
+        self.track_lengths = []
+
+    def add_track(self, events, length):
+        self.track_events.append(events)
+        self.track_lengths.append(length)
+
+    #(absolute tick, event) from all the tracks, in tick order; at the same tick, earlier tracks' first.
+    def events(self):
+        return heapq.merge(*self.track_events, key=itemgetter(0))
+
+    @property
+    def end_tick(self):
+        return max(self.track_lengths + [0])
+
+
 class Track(list):
     def __init__(self, events=[], tick_relative=True):
         self.tick_relative = tick_relative
@@ -67,13 +101,47 @@ class Track(list):
                 event.tick -= running_tick
                 running_tick += event.tick
 
+    #Delta and absolute ticks of the events, whichever mode the track is in.
+    def rel_ticks(self):
+        ticks = list(map(attrgetter("tick"), self))
+        if self.tick_relative:
+            return ticks
+        return list(map(sub, ticks, chain((0,), ticks)))
+
+    def abs_ticks(self):
+        ticks = list(map(attrgetter("tick"), self))
+        if self.tick_relative:
+            return list(accumulate(ticks))
+        return ticks
+
+    #Effective status byte of each event as the file has it (0xFF for Meta, 0xF0 for Sysex).
+    def statuses(self):
+        return [event.statusmsg | getattr(event, "channel", 0) for event in self]
+
+    #(absolute tick, event) of each event from tick t0 up to, not including, t1, found by bisection of the
+    #absolute ticks, so that only those events are touched (in a LazyTrack, decoded).  The ticks are taken afresh
+    #each time (abs_ticks is a C-level pass, and a LazyTrack's decodes nothing), so no change to the track or its
+    #events can leave them stale.
+    def events_between(self, t0, t1):
+        ticks = self.abs_ticks()
+        lo = bisect_left(ticks, t0)
+        hi = bisect_left(ticks, t1, lo)
+        return zip(ticks[lo:hi], map(self.__getitem__, range(lo, hi)))
+
+    #Those of measures first through last of time_model (a MidiTimeModel.TimeModel).
+    def events_in_measures(self, first, last, time_model):
+        return self.events_between(time_model.measure_start_tick(first), time_model.measure_start_tick(last + 1))
+
+    #Slices are copied by list's own slicing (a pointer copy); view() makes none at all.
     def __getitem__(self, item):
         if isinstance(item, slice):
-            indices = item.indices(len(self))
-            return Track((super(Track, self).__getitem__(i) for i in xrange(*indices)))
+            return Track(super(Track, self).__getitem__(item), tick_relative=self.tick_relative)
         else:
             return super(Track, self).__getitem__(item)
 
+    def view(self, start=0, stop=None):
+        return TrackView(self, start, stop)
+
     def __getslice__(self, i, j):
         # The deprecated __getslice__ is still called when subclassing built-in types
         # for calls of the form List[i:j]
@@ -81,3 +149,110 @@ class Track(list):
 
     def __repr__(self):
         return "midi.Track(\\\n  %s)" % (pformat(list(self)).replace('\n', '\n  '), )
+
+
+#Window on the events start:stop of a track (Track.view), reading the track's list in place: making one, or slicing
+#one (which makes another), is O(1) however many events it covers.  The first change made through a view copies its
+#events, each event too (make_ticks_abs/rel rewrite the events' ticks), into a Track of its own, to which it then
+#passes everything (copy on write), so the track is never changed through a view; changes to the track, though,
+#show through a view not yet copied, as with memoryview.  A view whose track has since been cut short of it raises
+#RuntimeError when used.  Until copied, like a slice, a view shares the events themselves.
+class TrackView(Sequence):
+    def __init__(self, track, start=0, stop=None):
+        self._view_of(track, range(len(track))[start:stop])
+
+    def _view_of(self, track, rows):
+        self._track = track
+        self._rows = rows    #None once copied
+        #list's own indexing for a plain Track; a subclass (LazyTrack) may need its own.
+        self._item = list.__getitem__.__get__(track) if type(track) is Track else track.__getitem__
+
+    @property
+    def copied(self):
+        return self._rows is None
+
+    @property
+    def tick_relative(self):
+        return self._track.tick_relative
+
+    def _live_rows(self):
+        rows = self._rows
+        if rows and max(rows[0], rows[-1]) >= len(self._track):
+            raise RuntimeError("TrackView of events its track no longer has (it has %d now)" % len(self._track))
+        return rows
+
+    def __len__(self):
+        if self._rows is None:
+            return len(self._track)
+        return len(self._live_rows())
+
+    def __getitem__(self, item):
+        if self._rows is None:
+            return self._track.view()[item] if isinstance(item, slice) else self._track[item]
+        if isinstance(item, slice):
+            view = TrackView.__new__(TrackView)
+            view._view_of(self._track, self._live_rows()[item])
+            return view
+        return self._item(self._live_rows()[item])
+
+    def __iter__(self):
+        if self._rows is None:
+            return iter(self._track)
+        return map(self._item, self._live_rows())
+
+    def __eq__(self, other):
+        return list(self) == (list(other) if isinstance(other, TrackView) else other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_track(self):
+        return Track(self, tick_relative=self.tick_relative)
+
+    def copy_on_write(self):
+        if self._rows is not None:
+            self._view_of(Track(deepcopy(list(self)), tick_relative=self.tick_relative), None)
+        return self._track
+
+    rel_ticks = Track.rel_ticks
+    abs_ticks = Track.abs_ticks
+    statuses = Track.statuses
+    events_between = Track.events_between
+    events_in_measures = Track.events_in_measures
+
+    def __repr__(self):
+        return "midi.TrackView(\\\n  %s)" % (pformat(list(self)).replace('\n', '\n  '), )
+
+
+def _copying(name):
+    def method(self, *args, **kw):
+        return getattr(self.copy_on_write(), name)(*args, **kw)
+    method.__name__ = name
+    return method
+
+for _name in ("__setitem__", "__delitem__", "append", "extend", "insert", "pop", "remove", "clear", "sort",
+              "reverse", "make_ticks_abs", "make_ticks_rel"):
+    setattr(TrackView, _name, _copying(_name))
+
+def _copying_iadd(self, other):
+    self.copy_on_write().extend(other)
+    return self
+TrackView.__iadd__ = _copying_iadd
+
+
+#(absolute tick, event) for each of the events, in order; "events" may be any iterable of them, whose own
+#tick_relative, if it has one (a Track), overrides the argument.
+def timed_events(events, tick_relative=True):
+    relative = getattr(events, "tick_relative", tick_relative)
+    if isinstance(events, list):
+        ticks = map(attrgetter("tick"), events)
+    else:
+        (events, copy) = tee(events)
+        ticks = map(attrgetter("tick"), copy)
+    return zip(accumulate(ticks) if relative else ticks, events)
+
+#The events of all the tracks, each already in time order, as one time-ordered stream of (absolute tick,
+#event), ties going to the earlier track, as a stable sort of them all, concatenated, would order them.
+#A heap merge holding one event per track: no merged list is built, and no event's tick is changed.
+def merge_timed_events(tracks, tick_relative=True):
+    return heapq.merge(*[timed_events(events, tick_relative) for events in tracks], key=itemgetter(0))
@@ -8,6 +8,7 @@
 import six
 from six import print_
 import math
+from operator import attrgetter
 
 trace = print_
 trace = lambda *x: None
@@ -50,6 +51,14 @@ trace = lambda *x: None
 #  --BSG 5/8/2017
 #
 # Rewritten 8/4/2017 for Python 3.6/2.7 compat (__init_subclass__, no more need for metaclass)
+#
+# Storage did turn out to matter after all, for scores of hundreds of thousands of events, so each
+# registered general-message class with _data_byte_slots_ now also gets a generated "Compact" subclass
+# (e.g., NoteOnEvent.Compact, "CompactNoteOnEvent"), whose __slots__ are tick, channel, and the data byte
+# slot names themselves.  It is still an instance of its class (and NoteEvent, etc.), but pitch, velocity
+# &c. are plain slots, not DataIndexDescriptors into a separate data list, and no dict is ever allocated
+# unless somebody stores a random property (the bases still permit it, as above).  "data" is a write-through
+# list-like view of the slots, so all data-using code works unchanged.  FileReader(compact=True) produces them.
 
 
 class DataIndexDescriptor(object):
@@ -75,10 +84,71 @@ class BigEndianDescriptor(object):
         instance.data = [(val >> (8*x)) & 0xFF for x in self.rrange()]
 
 
+#Write-through list-like view of a Compact event's data byte slots, which is what its "data" returns.
+class CompactDataBytes(object):
+    __slots__ = ("event",)
+    def __init__(self, event):
+        self.event = event
+
+    def __len__(self):
+        return self.event.length
+
+    def __getitem__(self, dx):
+        if isinstance(dx, slice):
+            return list(self.event._get_data_bytes_(self.event)[dx])
+        return getattr(self.event, self.event._data_byte_slots_[dx])
+
+    def __setitem__(self, dx, value):
+        setattr(self.event, self.event._data_byte_slots_[dx], value)
+
+    def __iter__(self):
+        return iter(self.event._get_data_bytes_(self.event))
+
+    def __eq__(self, other):
+        return self[:] == list(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return repr(self[:])
+
+class CompactEventMixin(object):
+    __slots__ = ()
+
+    def __init__(self, tick=0, channel=0, data=None, **kw):
+        self.tick = tick
+        self.channel = channel
+        self.data = data if data is not None else [0] * self.length
+        for key in kw:
+            setattr(self, key, kw[key])
+
+    def get_data(self):
+        return CompactDataBytes(self)
+    def set_data(self, data):
+        if len(data) != self.length:
+            raise ValueError("%s takes %d data bytes, not %r." % (self.__class__.__name__, self.length, data))
+        for (name, value) in zip(self._data_byte_slots_, data):
+            setattr(self, name, value)
+    data = property(get_data, set_data)
+
+def make_compact_event_class(cls):
+    slots = tuple(cls._data_byte_slots_)
+    if len(slots) == 1:
+        get_data_bytes = lambda event, get=attrgetter(slots[0]): (get(event),)
+    else:
+        get_data_bytes = attrgetter(*slots)  #tuple of them
+    return type(cls)("Compact" + cls.__name__, (CompactEventMixin, cls),
+                     {"__slots__" : ("tick", "channel") + slots, "_get_data_bytes_" : staticmethod(get_data_bytes),
+                      "NoEventReg" : True, "_compact_" : True, "__module__" : cls.__module__,
+                      "__qualname__" : cls.__qualname__ + ".Compact"})  #so pickle can find it
+
+
 #This implements "_data_byte_slots_", which is a parallel mechanism to
 #regular __slots__ for an ordered byte vector (and doesn't shut off random props).
+#Compact classes have real __slots__ of those names, which must not be overwritten.
 def implement_data_byte_slots(cls):
-    if hasattr(cls, "_data_byte_slots_"):  #note that this finds inherited attrs
+    if hasattr(cls, "_data_byte_slots_") and not cls.__dict__.get("_compact_", False):  #note that this finds inherited attrs
         slots = cls._data_byte_slots_
         trace ("implement_data_bytes %s (%s)" % (cls.__name__, ", ".join(slots)))
         setattr(cls, "length", len(slots))
@@ -88,6 +158,7 @@ def implement_data_byte_slots(cls):
 class EventRegistry(object):
     Events = {"name":"Events"}
     MetaEvents = {"name":"MetaEvents"}
+    CompactEvents = {"name":"CompactEvents"}  #Like Events, but Compact classes where there are such.
 
     @staticmethod
     def register_event_class(catalogue, event_class, key):
@@ -148,6 +219,9 @@ class EventMetaclass(AbstractEventMetaclass):
         if not classdict.get("NoEventReg", False):
             trace("Init EventMetaclass", cls, cls.__bases__)
             EventRegistry.register_event_class(EventRegistry.Events, cls, cls.statusmsg)
+            if hasattr(cls, "_data_byte_slots_"):
+                cls.Compact = make_compact_event_class(cls)
+            EventRegistry.register_event_class(EventRegistry.CompactEvents, getattr(cls, "Compact", cls), cls.statusmsg)
 
 @six.add_metaclass(EventMetaclass)
 class Event(AbstractEvent):
@@ -6,14 +6,27 @@
 #
 
 import six
+import os
+import gc
+import mmap
+import multiprocessing
+from array import array
+from contextlib import closing, contextmanager
+from itertools import accumulate
+from operator import attrgetter
 from warnings import *
 from containers import *
 from events import *
 from struct import unpack, pack
 from constants import *
 from util import *
+from lazytrack import *
 ADDRESS_TRACE = False
 
+#What the readers collect into a Pattern's ConductorMap as they parse.
+CONDUCTOR_EVENT_CLASSES = (TimeSignatureEvent, SetTempoEvent)
+CONDUCTOR_METACOMMANDS = tuple(cls.metacommand for cls in CONDUCTOR_EVENT_CLASSES)
+
 """
 The MIDI standard specifies that "Meta and Sysex events cancel Running Status", that is, the first "General
 Message" immediately following either must have its own Status Byte; it does not acquire the Status Byte
@@ -36,17 +49,171 @@ This warning will be suppressed for the remainder of the file.
 
 
 class FileReader(object):
+    #Parsing's warnings are given through this, so that a reader may hold them back (incremental_read_midi's does).
+    warn = staticmethod(warn)
 
-    def __init__(self):
+    #compact: build general messages as their slotted Compact classes where they have them (see events.py).
+    def __init__(self, compact=False):
         super(FileReader, self).__init__()
         self.last_event_class = None
         self.RSCompat_reported = False
+        self.event_classes = EventRegistry.CompactEvents if compact else EventRegistry.Events
 
-    def read(self, midifile):
+    #lazy: fill the pattern with LazyTracks, whose events are decoded only when accessed (see lazytrack.py).
+    def read(self, midifile, lazy=False):
         pattern = self.parse_file_header(midifile)
+        if lazy:
+            for tx in range(len(pattern)):
+                trksz = self.parse_track_header(midifile)
+                trackdata = bytearray(midifile.read(trksz))
+                pattern[tx] = self.scan_track_data(trackdata, 0, len(trackdata), pattern.conductor_map)
+            return pattern
         for track in pattern:
-            self.parse_track(midifile, track)
+            self.parse_track(midifile, track, pattern.conductor_map)
+        return pattern
+
+    #Parallel variant of read.  Once the file header is parsed the tracks are independent (parse_track_data
+    #resets RunningStatus), so all the track chunks are located and read first, then parsed in a pool of
+    #"processes" worker processes (default, one per CPU), and their events put in this reader's Pattern.
+    #Unpickling the workers' tracks here is then the serial part, so gains grow with tracks and CPUs.
+    #The workers' warnings are recorded and given here, in track order, the running-status compatibility
+    #one still once per file; a track whose parse fails in a worker is parsed again here, so what is raised
+    #(or, after that warning, tolerated) is just as in read.  A file whose track chunks can't all be located is read serially, for the same reason.
+    def read_parallel(self, midifile, processes=None):
+        start = midifile.tell()
+        pattern = self.parse_file_header(midifile)
+        try:
+            chunks = [midifile.read(self.parse_track_header(midifile)) for track in pattern]
+        except Exception:
+            midifile.seek(start)
+            return self.read(midifile)
+        jobs = [(chunk, self.event_classes is EventRegistry.CompactEvents) for chunk in chunks]
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if len(jobs) < 2 or processes < 2:   #nothing to gain from a pool; parse them here
+            return self.gather_parsed_tracks(pattern, chunks, map(parse_track_chunk, jobs))
+        pool = multiprocessing.Pool(processes)
+        try:
+            with gc_paused():  #the tracks are unpickled here
+                return self.gather_parsed_tracks(pattern, chunks, pool.imap(parse_track_chunk, jobs))
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def gather_parsed_tracks(self, pattern, chunks, results):
+        for (track, chunk, (events, warnings, conductor, length)) in zip(pattern, chunks, results):
+            if events is None:
+                self.parse_track_data(bytearray(chunk), track, conductor_map=pattern.conductor_map)
+                continue
+            track.extend(events)
+            pattern.conductor_map.add_track(conductor, length)
+            for (message, category) in warnings:
+                if message == RUNNING_STATUS_COMPATIBILITY_MESSAGE:
+                    if self.RSCompat_reported:
+                        continue
+                    self.RSCompat_reported = True
+                warn(message, category)
+        return pattern
+
+    #Memory-mapped variant of read.  The mmap object is itself file-like enough for the header
+    #parsers, and parse_track_data walks each track in place, so no track is ever copied out of
+    #the mapping; only event data bytes are (as they must be, into event "data" lists).
+    #Lazy tracks decode out of the mapping, so it then stays open until they have all been materialized.
+    def read_mapped(self, midifile, lazy=False):
+        if os.fstat(midifile.fileno()).st_size == 0:
+            raise TypeError ("Bad header in MIDI file.")  #mmap refuses empty files.
+        mapping = mmap.mmap(midifile.fileno(), 0, access=mmap.ACCESS_READ)
+        if lazy:
+            return self.read_mapped_1(mapping, midifile.tell(), lazy)
+        with closing(mapping):
+            return self.read_mapped_1(mapping, midifile.tell(), lazy)
+
+    def read_mapped_1(self, mapping, pos, lazy):
+        mapping.seek(pos)
+        pattern = self.parse_file_header(mapping)
+        for tx in range(len(pattern)):
+            pattern[tx] = self.parse_mapped_track(mapping, pattern[tx], lazy, pattern.conductor_map)
         return pattern
+
+    def parse_mapped_track(self, mapping, track, lazy=False, conductor_map=None):
+        trksz = self.parse_track_header(mapping)
+        pos = mapping.tell()
+        end = min(pos + trksz, len(mapping))
+        if lazy:
+            track = self.scan_track_data(mapping, pos, end, conductor_map)
+        else:
+            self.parse_track_data(mapping, track, pos, end, conductor_map)
+        mapping.seek(end)
+        return track
+
+    #First pass of lazy reading: find each event's offset, delta tick and effective status (its own status
+    #byte, or the running status it uses; 0xFF Meta, 0xF0 Sysex) without building it, validating running
+    #status exactly as parse_track_data does.  Returns the LazyTrack that decodes from these on demand.
+    #Only the tempo and time-signature events are decoded, for conductor_map, if given.
+    def scan_track_data(self, trackdata, pos, end, conductor_map=None):
+        self.RunningStatus = None
+        offsets = array('L')
+        ticks = array('L')
+        statuses = array('B')
+        conductor_dxs = []
+        data_lengths = self.data_lengths()
+        status = 0
+        try:
+            while pos < end:
+                start = pos
+                tick = trackdata[pos]
+                if tick & 0x80:
+                    (tick, pos) = read_varlen_at(trackdata, pos)
+                else:
+                    pos += 1
+                stsmsg = trackdata[pos]
+                pos += 1
+                if stsmsg < 0xF0:
+                    if stsmsg & 0x80:
+                        self.RunningStatus = stsmsg
+                        pos += data_lengths[stsmsg >> 4]
+                    else:
+                        if self.RunningStatus is None or status >= 0xF0:
+                            self.last_event_class = MetaEvent if status == 0xFF else SysexEvent
+                            self.validate_running_status()
+                        pos += data_lengths[self.RunningStatus >> 4] - 1
+                    status = self.RunningStatus
+                elif stsmsg == MetaEvent.statusmsg:
+                    if trackdata[pos] in CONDUCTOR_METACOMMANDS:
+                        conductor_dxs.append(len(offsets))
+                    (datalen, pos) = read_varlen_at(trackdata, pos + 1)
+                    pos += datalen
+                    status = stsmsg
+                elif stsmsg == SysexEvent.statusmsg:
+                    pos = trackdata.find(b'\xF7', pos, end) + 1
+                    if pos == 0:
+                        break
+                    status = stsmsg
+                else:
+                    raise RuntimeError("Status byte " + hex(stsmsg) + " (invalid Sysex with nonzero channel) in file.")
+                if pos > end:
+                    break
+                offsets.append(start)
+                ticks.append(tick)
+                statuses.append(status)
+        except IndexError:
+            pass
+        decoder = FileReader(compact=self.event_classes is EventRegistry.CompactEvents)
+        decoder.last_event_class = NoteOnEvent   #any channel message: validation was done here, in the scan
+        decoder.RSCompat_reported = True
+        track = LazyTrack(trackdata, end, offsets, ticks, statuses, decoder)
+        if conductor_map is not None:
+            conductor_dxs = [dx for dx in conductor_dxs if dx < len(offsets)]   #not a truncated last one
+            abs_ticks = list(accumulate(ticks)) if conductor_dxs else []
+            conductor_map.add_track([(abs_ticks[dx], track[dx]) for dx in conductor_dxs], sum(ticks))
+        return track
+
+    #General message data lengths by status high nibble.
+    def data_lengths(self):
+        lengths = [0] * 16
+        for key in range(0x80, 0xF0, 0x10):
+            lengths[key >> 4] = EventRegistry.Events[key].length
+        return lengths
         
     def parse_file_header(self, midifile):
         # First four bytes are MIDI header
@@ -67,7 +234,9 @@ class FileReader(object):
         # in the header are padding
         if hdrsz > DEFAULT_MIDI_HEADER_SIZE:
             midifile.read(hdrsz - DEFAULT_MIDI_HEADER_SIZE)
-        return Pattern(tracks=tracks, resolution=resolution, format=format)
+        pattern = Pattern(tracks=tracks, resolution=resolution, format=format)
+        pattern.conductor_map = ConductorMap()
+        return pattern
             
     def parse_track_header(self, midifile):
         # First four bytes are Track header
@@ -78,16 +247,89 @@ class FileReader(object):
         trksz = unpack(">L", midifile.read(4))[0]
         return trksz
 
-    def parse_track(self, midifile, track):
-        self.RunningStatus = None
+    def parse_track(self, midifile, track, conductor_map=None):
         trksz = self.parse_track_header(midifile)
-        trackdata = iter(midifile.read(trksz))
-        while True:
-            try:
-                event = self.parse_midi_event(trackdata)
-                track.append(event)
-            except StopIteration:
-                break
+        self.parse_track_data(bytearray(midifile.read(trksz)), track, conductor_map=conductor_map)
+
+    #The batch reader walks the whole track buffer with an integer offset rather than pulling it
+    #a byte at a time through an iterator (parse_midi_event, below, which the incremental readers
+    #still use).  "trackdata" need only index to ints and slice: bytearray, Python 3 bytes, or mmap,
+    #in which case pos/end delimit the track within the file.  A truncated last event is dropped,
+    #as the iterator version's StopIteration always did.
+    #The track's tempo and time-signature events, and its length, are added to conductor_map, if given.
+    def parse_track_data(self, trackdata, track, pos=0, end=None, conductor_map=None):
+        self.RunningStatus = None
+        if end is None:
+            end = len(trackdata)
+        append = track.append
+        abs_tick = 0
+        conductor = []
+        try:
+            while pos < end:
+                (event, pos) = self.parse_midi_event_at(trackdata, pos, end)
+                if pos > end:
+                    break
+                append(event)
+                abs_tick += event.tick
+                if self.last_event_class in CONDUCTOR_EVENT_CLASSES:
+                    conductor.append((abs_tick, event))
+        except IndexError:
+            pass
+        if conductor_map is not None:
+            conductor_map.add_track(conductor, abs_tick)
+        return track
+
+    def parse_midi_event_at(self, trackdata, pos, end):
+        # first datum is varlen representing delta-time; mostly just one byte.
+        tick = trackdata[pos]
+        if tick & 0x80:
+            (tick, pos) = read_varlen_at(trackdata, pos)
+        else:
+            pos += 1
+        # next byte is status message (or perhaps < 128 first byte of "general-message" data)
+        stsmsg = trackdata[pos]
+        pos += 1
+        if stsmsg < 0xF0:
+            # general message, by far the commonest case, preceded by status message or not.
+            if stsmsg & 0x80:
+                self.RunningStatus = stsmsg
+                cls = self.event_classes[stsmsg & 0xF0]
+                npos = pos + cls.length
+                data = list(trackdata[pos:npos])
+            else:
+                # See parse_midi_event: leading data byte cannot have its high bit on.
+                # Nothing to validate when running status follows a general message.
+                if self.RunningStatus is None or self.last_event_class.statusmsg >= 0xF0:
+                    self.validate_running_status()
+                cls = self.event_classes[self.RunningStatus & 0xF0]
+                npos = pos + cls.length - 1
+                data = [stsmsg]
+                data += trackdata[pos:npos]
+            if npos > end:
+                raise IndexError("General message runs off end of track.")  #before a Compact class rejects it
+            self.last_event_class = cls
+            return (cls(tick=tick, channel=self.RunningStatus & 0x0F, data=data), npos)
+        # is the event a MetaEvent?
+        elif MetaEvent.is_event(stsmsg):
+            cmd = trackdata[pos]
+            if cmd not in EventRegistry.MetaEvents:
+                self.warn("Unknown Meta MIDI Event: " + str(cmd), Warning)
+                cls = UnknownMetaEvent
+            else:
+                cls = EventRegistry.MetaEvents[cmd]
+            (datalen, pos) = read_varlen_at(trackdata, pos + 1)
+            npos = pos + datalen
+            self.last_event_class = cls
+            return (cls(tick=tick, data=list(trackdata[pos:npos]), metacommand=cmd), npos)
+        # is this event a Sysex Event?
+        elif SysexEvent.is_event(stsmsg):
+            npos = trackdata.find(b'\xF7', pos, end)
+            if npos < 0:
+                raise IndexError("Sysex event runs off end of track.")  #i.e., truncated, as above
+            self.last_event_class = SysexEvent
+            return (SysexEvent(tick=tick, data=list(trackdata[pos:npos])), npos + 1)
+        else:
+            raise RuntimeError("Status byte " + hex(stsmsg) + " (invalid Sysex with nonzero channel) in file.")
 
     def parse_midi_event(self, trackdata):
         # first datum is varlen representing delta-time
@@ -98,7 +340,7 @@ class FileReader(object):
         if MetaEvent.is_event(stsmsg):
             cmd = midi_byte2int(next(trackdata))
             if cmd not in EventRegistry.MetaEvents:
-                warn("Unknown Meta MIDI Event: " + str(cmd), Warning)
+                self.warn("Unknown Meta MIDI Event: " + str(cmd), Warning)
                 cls = UnknownMetaEvent
             else:
                 cls = EventRegistry.MetaEvents[cmd]
@@ -132,7 +374,7 @@ class FileReader(object):
                 key = self.RunningStatus & 0xF0
                 data = [stsmsg]         #Byte was not statusmsg, but first byte of data.
 
-            cls = EventRegistry.Events[key]
+            cls = self.event_classes[key]
             data += [midi_byte2int(next(trackdata)) for x in range(cls.length - len(data))]
             channel = self.RunningStatus & 0x0F
             self.last_event_class = cls
@@ -147,13 +389,42 @@ class FileReader(object):
             raise RuntimeError("MIDI data (< 128) in stream with no pending Status Message.")
         elif issubclass (self.last_event_class, (MetaEvent, SysexEvent)):
             self.RSCompat_reported = True
-            warn(RUNNING_STATUS_COMPATIBILITY_MESSAGE, Warning)
+            self.warn(RUNNING_STATUS_COMPATIBILITY_MESSAGE, Warning)
         return
 
     def has_running_status_errors(self):
         return self.RSCompat_reported
 
 
+#Events hold no reference cycles, so building (or unpickling) hundreds of thousands of them need not
+#trigger the cyclic collector's repeated full passes over them, which otherwise take most of the time.
+@contextmanager
+def gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+#Worker of FileReader.read_parallel: parse one track chunk with a fresh reader.  Returns the events, the
+#(message, category) of each warning the parse gave, in order (they are given by the parent), and the
+#track's conductor events and length (see ConductorMap), or all None if the parse raised.
+def parse_track_chunk(job):
+    (chunk, compact) = job
+    reader = FileReader(compact=compact)
+    conductor_map = ConductorMap()
+    try:
+        with catch_warnings(record=True) as caught, gc_paused():
+            simplefilter("always")
+            track = reader.parse_track_data(chunk, Track(), conductor_map=conductor_map)
+    except Exception:
+        return (None, None, None, None)
+    warnings = [(str(w.message), w.category) for w in caught]
+    return (track, warnings, conductor_map.track_events[0], conductor_map.track_lengths[0])
+
+
 class FileWriter(object):
     def write(self, midifile, pattern):
         self.write_file_header(midifile, pattern)
@@ -168,57 +439,174 @@ class FileWriter(object):
                             pattern.resolution)
         midifile.write(b'MThd' + packdata)
             
+    #The track is encoded into one growable bytearray, extended in place per event (appending to
+    #immutable bytes copied the whole track each time, quadratic in its length), then written
+    #behind its header.
     def write_track(self, midifile, track):
-        buf = b''
+        buf = bytearray()
         self.RunningStatus = None
         if ADDRESS_TRACE:
             bas = midifile.tell() + len(self.encode_track_header(0))
             print_("TRACK BASE after hdr", bas)
- 
+
+        encoders = EVENT_ENCODERS
         for event in track:
-            newstuff = self.encode_midi_event(event)
+            start = len(buf)
+            buf += VARLEN_BYTES[event.tick]
+            encoders[event.__class__](self, buf, event)
             if ADDRESS_TRACE:
-                print_ (len(buf)+bas, len(newstuff), event)
-            buf += newstuff
+                print_ (start+bas, len(buf)-start, event)
 
-        buf = self.encode_track_header(len(buf)) + buf
+        midifile.write(self.encode_track_header(len(buf)))
         midifile.write(buf)
 
     def encode_track_header(self, trklen):
         return b'MTrk' + pack(">L", trklen)
 
+    #Streaming counterpart of write, for output built on the fly: "tracks" is any iterable of event
+    #iterables (generators, say), each encoded straight to the file behind a placeholder MTrk length
+    #that is patched when the track ends, as is the header's track count at the end.  So the file must
+    #be seekable, but no Pattern, Track or whole-track buffer need exist.  Ticks are relative unless
+    #tick_relative is False, or the events come in a Track, whose tick_relative then rules.
+    def write_streaming(self, midifile, tracks, resolution=220, format=1, tick_relative=True):
+        header_pos = midifile.tell()
+        self.write_file_header(midifile, Pattern(resolution=resolution, format=format))
+        ntracks = 0
+        for events in tracks:
+            self.write_track_streaming(midifile, events, getattr(events, "tick_relative", tick_relative))
+            ntracks += 1
+        end = midifile.tell()
+        midifile.seek(header_pos + 10)   #MThd, header length, format
+        midifile.write(pack(">H", ntracks))
+        midifile.seek(end)
+
+    def write_track_streaming(self, midifile, events, tick_relative=True, flush_size=0x10000):
+        self.write_timed_track_streaming(midifile, timed_events(events, tick_relative), flush_size)
+
+    #The track from (absolute tick, event) pairs (see timed_events in containers.py), deltas taken as
+    #they go; the events' own ticks are not used.
+    def write_timed_track_streaming(self, midifile, timed, flush_size=0x10000):
+        self.RunningStatus = None
+        header_pos = midifile.tell()
+        midifile.write(self.encode_track_header(0))
+        if ADDRESS_TRACE:
+            print_("TRACK BASE after hdr", header_pos + 8)
+        buf = bytearray()
+        trklen = 0
+        prev_tick = 0
+        encoders = EVENT_ENCODERS
+        for (tick, event) in timed:
+            start = len(buf)
+            buf += VARLEN_BYTES[tick - prev_tick]
+            prev_tick = tick
+            encoders[event.__class__](self, buf, event)
+            if ADDRESS_TRACE:
+                print_ (header_pos + 8 + trklen + start, len(buf) - start, event)
+            if len(buf) >= flush_size:
+                midifile.write(buf)
+                trklen += len(buf)
+                del buf[:]
+        midifile.write(buf)
+        trklen += len(buf)
+        end = midifile.tell()
+        midifile.seek(header_pos)
+        midifile.write(self.encode_track_header(trklen))
+        midifile.seek(end)
+
+    #Format 0 file of all the tracks merged into one, as they are written (merge_timed_events in
+    #containers.py), rather than merged first into a Track of all the events: the tracks' own End of
+    #Track events are dropped, and one is put end_delta ticks after the last event.  The tracks must
+    #each be in time order; they are not changed.  Seekable files only, as write_streaming.
+    def write_merged(self, midifile, tracks, resolution=220, tick_relative=True, end_delta=1):
+        self.write_file_header(midifile, Pattern(tracks=[Track()], resolution=resolution, format=0))
+        self.write_timed_track_streaming(midifile, self.end_merged_track(merge_timed_events(tracks, tick_relative), end_delta))
+
+    def end_merged_track(self, timed, end_delta):
+        last = 0
+        for (tick, event) in timed:
+            if not isinstance(event, EndOfTrackEvent):
+                last = tick
+                yield (tick, event)
+        yield (last + end_delta, EndOfTrackEvent())
+
     def encode_midi_event(self, event):
-        ret = b''
-        ret += write_varlen(event.tick)
-        # is the event a MetaEvent?
-        if isinstance(event, MetaEvent):
-            ret += midi_pack_bytes([event.statusmsg, event.metacommand])
-            ret += write_varlen(len(event.data))
-            ret += midi_pack_bytes(event.data)
-            # https://www.csie.ntu.edu.tw/~r92092/ref/midi/ :
-            # Running status is cancelled by any <sysex_event> or <meta_event>
-            self.RunningStatus = None ## BSG 24 Aug 2017
-        # is this event a Sysex Event?
-        elif isinstance(event, SysexEvent):
-            ret += midi_pack_bytes([0xF0])
-            ret += midi_pack_bytes(event.data)
-            ret += midi_pack_bytes([0xF7])
-            # https://www.csie.ntu.edu.tw/~r92092/ref/midi/ :
-            # Running status is cancelled by any <sysex_event> or <meta_event>
-            self.RunningStatus = None ## BSG 3 Jan 2017 (python3 5/5/2017 Hola!)
-        # not a Meta MIDI event or a Sysex event, must be a general message
-        elif isinstance(event, Event):
-            if not self.RunningStatus or \
-                self.RunningStatus.statusmsg != event.statusmsg or \
-                self.RunningStatus.channel != event.channel:
-                    self.RunningStatus = event
-                    ret += midi_pack_bytes([event.statusmsg | event.channel])
-            if event.data[0] < 0 or event.data[0] > 127:
-                raise ValueError( "Leading byte of midi data > 127, aliases status bytes: " + str(event))
-            ret += midi_pack_bytes(event.data)
+        buf = bytearray()
+        self.encode_midi_event_into(buf, event)
+        return bytes(buf)
+
+    def encode_midi_event_into(self, buf, event):
+        buf += VARLEN_BYTES[event.tick]
+        return self.encode_midi_event_body_into(buf, event)
+
+    #All of the encoding but the delta time, by the event's class's entry in EVENT_ENCODERS (below).
+    def encode_midi_event_body_into(self, buf, event):
+        EVENT_ENCODERS[event.__class__](self, buf, event)
+        return buf
+
+
+#Per-class event encoders for FileWriter, each encoding all of an event but its delta time into the
+#track's bytearray, running-status decision included: a dict lookup on the event's class replaces the
+#isinstance chain (Meta, then Sysex, then general message), and general messages of known status are
+#encoded without re-deriving it.  Entries are made at import for every class in the EventRegistry
+#tables (Compact ones too), Sysex and unknown Meta, and for any other class on first sight.
+#RunningStatus is the status byte last written, None after Meta and Sysex, which cancel running status.
+
+def encode_meta_event(writer, buf, event):
+    data = event.data
+    buf.append(event.statusmsg)
+    buf.append(event.metacommand)
+    buf += VARLEN_BYTES[len(data)]
+    buf.extend(data)
+    # https://www.csie.ntu.edu.tw/~r92092/ref/midi/ :
+    # Running status is cancelled by any <sysex_event> or <meta_event>
+    writer.RunningStatus = None ## BSG 24 Aug 2017
+
+def encode_sysex_event(writer, buf, event):
+    buf.append(0xF0)
+    buf.extend(event.data)
+    buf.append(0xF7)
+    # https://www.csie.ntu.edu.tw/~r92092/ref/midi/ :
+    # Running status is cancelled by any <sysex_event> or <meta_event>
+    writer.RunningStatus = None ## BSG 3 Jan 2017 (python3 5/5/2017 Hola!)
+
+def encode_unknown_event(writer, buf, event):
+    raise ValueError( "Unknown MIDI Event: " + str(event))
+
+#General messages of one class; "data_bytes" reads a Compact event's slots without making a data view.
+def make_general_message_encoder(cls):
+    statusmsg = cls.statusmsg
+    data_bytes = cls._get_data_bytes_ if issubclass(cls, CompactEventMixin) else attrgetter("data")
+    def encode_general_message(writer, buf, event):
+        status = statusmsg | event.channel
+        if status != writer.RunningStatus:
+            writer.RunningStatus = status
+            buf.append(status)
+        data = data_bytes(event)
+        if data[0] < 0 or data[0] > 127:
+            raise ValueError( "Leading byte of midi data > 127, aliases status bytes: " + str(event))
+        buf.extend(data)
+    return encode_general_message
+
+class EventEncoders(dict):
+    def __missing__(self, cls):
+        if issubclass(cls, MetaEvent):
+            encoder = encode_meta_event
+        elif issubclass(cls, SysexEvent):
+            encoder = encode_sysex_event
+        elif issubclass(cls, Event):
+            encoder = make_general_message_encoder(cls)
         else:
-            raise ValueError( "Unknown MIDI Event: " + str(event))
-        return ret
+            encoder = encode_unknown_event
+        self[cls] = encoder
+        return encoder
+
+EVENT_ENCODERS = EventEncoders()
+for _table in (EventRegistry.Events, EventRegistry.CompactEvents, EventRegistry.MetaEvents):
+    for _key in _table:
+        if _key != "name":
+            EVENT_ENCODERS[_table[_key]]
+EVENT_ENCODERS[SysexEvent]
+EVENT_ENCODERS[UnknownMetaEvent]
 
 def write_midifile(midifile, pattern):
     if isinstance(midifile, six.string_types):
@@ -226,8 +614,36 @@ def write_midifile(midifile, pattern):
     writer = FileWriter()
     return writer.write(midifile, pattern)
 
-def read_midifile(midifile):
+#Streaming counterpart of write_midifile (see FileWriter.write_streaming); midifile, if not a path,
+#must be seekable.
+def write_midifile_streaming(midifile, tracks, resolution=220, format=1, tick_relative=True):
+    if isinstance(midifile, six.string_types):
+        with open(midifile, 'wb') as f:
+            return FileWriter().write_streaming(f, tracks, resolution, format, tick_relative)
+    return FileWriter().write_streaming(midifile, tracks, resolution, format, tick_relative)
+
+#Merging counterpart of write_midifile_streaming (see FileWriter.write_merged).
+def write_midifile_merged(midifile, tracks, resolution=220, tick_relative=True, end_delta=1):
     if isinstance(midifile, six.string_types):
-        midifile = open(midifile, 'rb')
-    reader = FileReader()
-    return reader.read(midifile)
+        with open(midifile, 'wb') as f:
+            return FileWriter().write_merged(f, tracks, resolution, tick_relative, end_delta)
+    return FileWriter().write_merged(midifile, tracks, resolution, tick_relative, end_delta)
+
+#use_mmap reads through a memory map of the file (which must be a path or a real file with a fileno).
+#compact builds general messages as slotted Compact events (see events.py).
+#lazy decodes events only when they are accessed (see lazytrack.py).
+#parallel parses the tracks in worker processes, one per CPU, or as many as given (FileReader.read_parallel);
+#it reads the track chunks to send them to the workers, so use_mmap doesn't apply, and lazy overrides it.
+def read_midifile(midifile, use_mmap=False, compact=False, lazy=False, parallel=False):
+    reader = FileReader(compact=compact)
+    if isinstance(midifile, six.string_types):
+        with open(midifile, 'rb') as f:
+            return read_open_midifile(reader, f, use_mmap, lazy, parallel)
+    return read_open_midifile(reader, midifile, use_mmap, lazy, parallel)
+
+def read_open_midifile(reader, midifile, use_mmap, lazy, parallel):
+    if parallel and not lazy:
+        return reader.read_parallel(midifile, None if parallel is True else parallel)
+    elif use_mmap:
+        return reader.read_mapped(midifile, lazy)
+    return reader.read(midifile, lazy)
@@ -0,0 +1,145 @@
+#For BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard Greenberg
+#Offered according to GNU Public License Version 3
+#See LICENSE in project directory.
+#
+
+from itertools import accumulate
+from containers import *
+
+"""
+LazyTrack is what read_midifile(..., lazy=True) puts in its Pattern.  The reader makes one cheap pass over each
+track (FileReader.scan_track_data) recording only where each event starts, its delta tick, and its effective
+status byte (the running status, for events without their own), in compact arrays; running-status validation and
+its compatibility warning happen in that pass, as in the batch reader.  Events are decoded from the retained track
+bytes the first time they are accessed and cached in place, so tools that look at one track, or one stretch of a
+track, pay only for that.  len(), rel_ticks(), abs_ticks(), statuses() and offsets() need no decoding at all.
+
+A LazyTrack is a real Track (list), holding None for not-yet-decoded events.  Anything that rearranges or replaces
+its contents first decodes all of them (materialize()), after which it behaves, and costs, exactly as a Track.
+"""
+
+
+class LazyTrack(Track):
+    def __init__(self, trackdata, end, offsets, ticks, statuses, decoder, tick_relative=True):
+        super(LazyTrack, self).__init__([None] * len(offsets), tick_relative=tick_relative)
+        self._data = trackdata   #None once materialized
+        self._end = end
+        self._offsets = offsets
+        self._ticks = ticks
+        self._statuses = statuses
+        self._decoder = decoder
+        self._n_decoded = 0
+
+    def _event(self, dx):
+        event = list.__getitem__(self, dx)
+        if event is None:
+            decoder = self._decoder
+            decoder.RunningStatus = self._statuses[dx]  #meaningful only for general messages, but harmless
+            (event, pos) = decoder.parse_midi_event_at(self._data, self._offsets[dx], self._end)
+            list.__setitem__(self, dx, event)
+            self._n_decoded += 1
+            if self._n_decoded == len(self):
+                self.materialize()
+        return event
+
+    def is_materialized(self):
+        return self._data is None
+
+    def materialize(self):
+        if self._data is not None:
+            if self._n_decoded < len(self):
+                for dx in range(len(self)):
+                    self._event(dx)
+            self._data = self._offsets = self._ticks = self._statuses = self._decoder = None
+        return self
+
+    def __getitem__(self, item):
+        if self._data is None:
+            return super(LazyTrack, self).__getitem__(item)
+        if isinstance(item, slice):
+            return Track((self._event(dx) for dx in range(*item.indices(len(self)))), tick_relative=self.tick_relative)
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("list index out of range")
+        return self._event(item)
+
+    def __iter__(self):
+        if self._data is None:
+            return list.__iter__(self)
+        return self._iter_lazily()
+
+    def _iter_lazily(self):
+        for dx in range(len(self)):
+            yield self._event(dx) if self._data is not None else list.__getitem__(self, dx)
+
+    def __reversed__(self):
+        return reversed(self.materialize()[:])
+
+    def __contains__(self, item):
+        return list.__contains__(self.materialize(), item)
+
+    def index(self, *args):
+        return list.index(self.materialize(), *args)
+
+    def count(self, item):
+        return list.count(self.materialize(), item)
+
+    def copy(self):
+        return list.copy(self.materialize())
+
+    def __eq__(self, other):
+        return list.__eq__(self.materialize(), other)
+
+    def __ne__(self, other):
+        return list.__ne__(self.materialize(), other)
+
+    def __add__(self, other):
+        return list.__add__(self.materialize(), other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def rel_ticks(self):
+        if self._data is None or not self.tick_relative:
+            return super(LazyTrack, self).rel_ticks()
+        if self._n_decoded == 0:
+            return self._ticks
+        return [self._ticks[dx] if event is None else event.tick for (dx, event) in enumerate(list.__iter__(self))]
+
+    def abs_ticks(self):
+        if self._data is None or not self.tick_relative:
+            return super(LazyTrack, self).abs_ticks()
+        return list(accumulate(self.rel_ticks()))
+
+    def statuses(self):
+        if self._data is None:
+            return super(LazyTrack, self).statuses()
+        if self._n_decoded == 0:
+            return self._statuses
+        return [self._statuses[dx] if event is None else event.statusmsg | getattr(event, "channel", 0)
+                for (dx, event) in enumerate(list.__iter__(self))]
+
+    #Where each event starts in the track data (for indexing the file); not kept once materialized.
+    def offsets(self):
+        if self._data is None:
+            raise ValueError("A materialized LazyTrack no longer has its event offsets.")
+        return self._offsets
+
+    def __repr__(self):
+        self.materialize()
+        return super(LazyTrack, self).__repr__()
+
+
+#Everything else that changes the list's contents materializes it first.
+def _materializing(name):
+    list_method = getattr(list, name)
+    def method(self, *args, **kw):
+        return list_method(self.materialize(), *args, **kw)
+    method.__name__ = name
+    return method
+
+for _name in ("__setitem__", "__delitem__", "__iadd__", "__imul__", "append", "extend", "insert",
+              "pop", "remove", "clear", "sort", "reverse"):
+    setattr(LazyTrack, _name, _materializing(_name))
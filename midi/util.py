@@ -20,8 +20,11 @@ def midi_pack_bytes(bb):
         return bytearray(bb)
 
 def read_varlen(data):
+    chr = midi_byte2int(six.next(data))
+    if not (chr & 0x80):
+        return chr    #the usual, one-byte, case
     NEXTBYTE = 1
-    value = 0
+    value = chr & 0x7f
     while NEXTBYTE:
         chr = midi_byte2int(six.next(data))
         # is the hi-bit set?
@@ -36,6 +39,20 @@ def read_varlen(data):
         value += chr
     return value
 
+#Offset-cursor counterpart of read_varlen for parsers walking a whole buffer (bytearray, bytes
+#under Python 3, mmap) by index.  Returns (value, offset past the varlen); IndexError at end of data.
+def read_varlen_at(data, pos):
+    chr = data[pos]
+    if chr < 0x80:
+        return (chr, pos + 1)
+    value = chr & 0x7F
+    while True:
+        pos += 1
+        chr = data[pos]
+        value = (value << 7) | (chr & 0x7F)
+        if chr < 0x80:
+            return (value, pos + 1)
+
 def write_varlen(value):
     chr1 = (value & 0x7F)
     value >>= 7
@@ -56,3 +73,13 @@ def write_varlen(value):
         res = midi_pack_bytes([chr1])
     return res
 
+#VARLEN_BYTES[value] is write_varlen(value), memoized for the values that fit in two bytes (nearly all
+#delta times); larger ones are encoded each time.  Indexing it is a dict lookup, not a Python call.
+class VarlenBytes(dict):
+    def __missing__(self, value):
+        res = bytes(write_varlen(value))
+        if 0 <= value < 0x4000:
+            self[value] = res
+        return res
+
+VARLEN_BYTES = VarlenBytes()
@@ -16,7 +16,7 @@ import re
 
 import time
 from fractions import Fraction
-from collections import defaultdict, namedtuple
+from collections import Counter, defaultdict, namedtuple
 
 import ConfigMan
 import midi
@@ -190,19 +190,26 @@ def compfrac(value):
      return Fraction(int(m.group(1)), int(m.group(2)))
 
 def dump_track_channel_content(index, track):
+    #A Track's statuses() doesn't decode lazy tracks; any other iterable of events will do too.
+    statuses = track.statuses() if isinstance(track, midi.Track) else \
+        [event.statusmsg | getattr(event, "channel", 0) for event in track]
+    dump_track_status_counts(index, Counter(statuses).items())
+
+#The same, from (effective status, count) pairs, as a MidiMeasureIndex keeps them.
+def dump_track_status_counts(index, status_counts):
     note_ctr = defaultdict(int)
     ctrl_ctr = defaultdict(int)
     meta_ct = 0
     sysex_ct = 0
-    for ev in track:
-        if isinstance(ev, midi.NoteEvent):
-            note_ctr[ev.channel] += 1
-        elif isinstance(ev, midi.MetaEvent):
-            meta_ct += 1
-        elif isinstance(ev, midi.SysexEvent):
-            sysex_ct += 1
+    for (status, count) in status_counts:
+        if status == midi.MetaEvent.statusmsg:
+            meta_ct += count
+        elif status == midi.SysexEvent.statusmsg:
+            sysex_ct += count
+        elif status & 0xF0 in (midi.NoteOnEvent.statusmsg, midi.NoteOffEvent.statusmsg):
+            note_ctr[status & 0x0F] += count
         else:
-            ctrl_ctr[ev.channel] += 1
+            ctrl_ctr[status & 0x0F] += count
     def p(x):
         sys.stdout.write(x)
     p("Track %2d: " % index)
@@ -261,9 +268,12 @@ class ConverterBase(object):
             basic,ext = os.path.splitext(sname)
             target = os.path.join(dir, basic + "." + suffix + ext)
         target = os.path.abspath(os.path.expanduser(target))
-        write_midifile(target, self.midi_data)
+        self.write_midi_data(target)
         print ("Wrote ", target+",", "len=", os.path.getsize(target), "bytes.\n"+time.ctime())
 
+    def write_midi_data(self, target):
+        write_midifile(target, self.midi_data)
+
     def verify_integer_ticks(self, track):
         for i in range(1, len(track)):
             tick = track[i].tick
@@ -290,9 +300,26 @@ class ConverterBase(object):
 
         if not quiet:
             print (self.app + ":", "Processing ", input_midi_path)
+        if ConfigMan.get_parse_cache_config()[0] is not None:
+            import MidiParseCache   #only then: it brings in zlib and hashlib
+            cache = MidiParseCache.configured_cache()
+            (self.midi_data, self.time_model, cached) = cache.read_and_time_model(input_midi_path, start_measure)
+            if cached and not quiet:
+                print (self.app + ":", "Parsed MIDI and time model from cache", cache.directory)
+            return
         self.midi_data = midi.read_midifile(input_midi_path)
 
-        self.time_model = MidiTimeModel.build_time_model(self.midi_data, start_measure)
+        self.time_model = MidiTimeModel.build_time_model(self.midi_data, start_measure, as_read=True)
+
+    #Coroutine counterpart, for converters run concurrently on one event loop (see MidiAsync.py).
+    async def read_and_time_model_async(self, path, start_measure = 1, quiet=False, midi_io=None):
+        input_midi_path = os.path.abspath(os.path.expanduser(path))
+
+        if not quiet:
+            print (self.app + ":", "Processing ", input_midi_path)
+        import MidiAsync   #here, so that the tools that don't run on an event loop don't load asyncio
+        midi_io = midi_io or MidiAsync.AsyncMidiIO()
+        (self.midi_data, self.time_model) = await midi_io.read_and_time_model(input_midi_path, start_measure)
 
     def report_app_signature(self, path):
         print (self.app+":", path, "modified: %s" % time.ctime(os.path.getmtime(path)))
@@ -0,0 +1,252 @@
+#! /usr/bin/python
+
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import sys
+assert(sys.version_info[0] >= 3)
+
+import os
+import io
+import gc
+import json
+import time
+import argparse
+import tempfile
+import warnings
+import tracemalloc
+
+import ConfigMan
+import midi
+assert midi == ConfigMan.getMidi()
+
+import incremental_read_midi as IRM
+from synth_score import add_score_arguments, score_from_args
+
+HELP_TEXT = \
+"""Benchmark the MIDI package's read, write and tick-conversion paths on a deterministic synthetic
+score (see synth_score.py) or a given file.  Reports the best of several timed runs of each case, as
+events/sec and bytes/sec, and the peak memory allocated by one further run (under tracemalloc, which
+would distort the timings).  Results are compared with stored baselines (-s saves them), and any case
+slower, or hungrier, than its baseline by more than the tolerance is flagged, as is the exit status."""
+
+EPILOG= \
+"""Cases:
+  read           midi.read_midifile               write          midi.write_midifile
+  read-mmap      ... use_mmap=True                write-stream   midi.write_midifile_streaming
+  read-compact   ... compact=True                 write-merged   midi.write_midifile_merged
+  read-lazy      ... lazy=True (scan only)        asyread        AsyFileReader.asyread, all items
+  tree-access    AsyTreeFileReader.access, all events
+  ticks-abs      Pattern.make_ticks_abs           ticks-rel      Pattern.make_ticks_rel
+  ticks-columnar ColumnarPattern.make_ticks_abs, then make_ticks_rel
+Baselines are kept per score (generator parameters, or file name and size) in the baselines file."""
+
+DEFAULT_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "midibench_baselines.json")
+
+#Each case maker takes the Bench and returns (prepare, run, does-I/O): prepare() is called, untimed,
+#before each run(); bytes/sec is reported only for cases that read or write the file.
+def read_case(**kw):
+    def make(bench):
+        return (None, lambda: midi.read_midifile(bench.path, **kw), True)
+    return make
+
+def write_case(bench):
+    pattern = bench.pattern()
+    return (None, lambda: midi.write_midifile(io.BytesIO(), pattern), True)
+
+def write_stream_case(bench):
+    pattern = bench.pattern()
+    return (None, lambda: midi.write_midifile_streaming(io.BytesIO(), pattern, pattern.resolution, pattern.format), True)
+
+def write_merged_case(bench):
+    pattern = bench.pattern()
+    return (None, lambda: midi.write_midifile_merged(io.BytesIO(), pattern, pattern.resolution), True)
+
+def asyread_case(bench):
+    def run():
+        for item in IRM.AsyFileReader().asyread(bench.path):
+            pass
+    return (None, run, True)
+
+def tree_access_case(bench):
+    def run():
+        reader = IRM.AsyTreeFileReader()
+        for track in reader.access(bench.path).tracks:
+            for item in track.events:
+                pass
+    return (None, run, True)
+
+def ticks_case(to_abs):
+    def make(bench):
+        pattern = bench.pattern()
+        if to_abs:
+            return (pattern.make_ticks_rel, pattern.make_ticks_abs, False)
+        return (pattern.make_ticks_abs, pattern.make_ticks_rel, False)
+    return make
+
+def columnar_ticks_case(bench):
+    pattern = midi.ColumnarPattern.from_pattern(bench.pattern())
+    def run():
+        pattern.make_ticks_abs()
+        pattern.make_ticks_rel()
+    return (None, run, False)
+
+CASES = [("read", read_case()),
+         ("read-mmap", read_case(use_mmap=True)),
+         ("read-compact", read_case(compact=True)),
+         ("read-lazy", read_case(lazy=True)),
+         ("write", write_case),
+         ("write-stream", write_stream_case),
+         ("write-merged", write_merged_case),
+         ("asyread", asyread_case),
+         ("tree-access", tree_access_case),
+         ("ticks-abs", ticks_case(True)),
+         ("ticks-rel", ticks_case(False)),
+         ("ticks-columnar", columnar_ticks_case)]
+
+
+class Bench(object):
+    def __init__(self, path, repeat, measure_memory):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.repeat = repeat
+        self.measure_memory = measure_memory
+        self.events = sum(map(len, self.pattern()))
+
+    def pattern(self):
+        return midi.read_midifile(self.path)
+
+    def run_case(self, make_case):
+        (prepare, run, io_case) = make_case(self)
+        best = None
+        for i in range(self.repeat):
+            if prepare:
+                prepare()
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result = {"seconds": best,
+                  "events_per_sec": self.events / best,
+                  "bytes_per_sec": self.size / best if io_case else None}
+        if self.measure_memory:
+            if prepare:
+                prepare()
+            gc.collect()
+            tracemalloc.start()
+            run()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return result
+
+def score_key(args):
+    if args.input:
+        return "file:%s:%d" % (os.path.basename(args.input), os.path.getsize(args.input))
+    return "synth:t%d-e%d-S%g-%s-T%d-q%d-seed%d" % (args.tracks, args.events, args.sysex_density,
+        args.running_status, args.tempo_changes, args.resolution, args.seed)
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baselines(path, baselines):
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+#Percent worse than baseline, of time and of memory (None where there's nothing to compare).
+def regressions(result, baseline):
+    if not baseline:
+        return (None, None)
+    time_pct = 100.0 * (result["seconds"] / baseline["seconds"] - 1)
+    mem_pct = None
+    if result.get("peak_bytes") and baseline.get("peak_bytes"):
+        mem_pct = 100.0 * (result["peak_bytes"] / float(baseline["peak_bytes"]) - 1)
+    return (time_pct, mem_pct)
+
+def fmt_rate(value, scale, unit):
+    return "%8.2f %s" % (value / scale, unit) if value is not None else "%8s %s" % ("-", " " * len(unit))
+
+def fmt_pct(pct):
+    return "%+6.1f%%" % pct if pct is not None else "%7s" % "-"
+
+def parse_and_validate_args():
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter, description=HELP_TEXT, epilog=EPILOG)
+    def aa(*argsa,**argsk):
+        parser.add_argument(*argsa,**argsk)
+    add_score_arguments(parser)
+    aa('-i', '--input', metavar="path", help="Benchmark this MIDI file instead of a synthetic score.")
+    aa('-k', '--keep', metavar="path", help="Also write the synthetic score to this file.")
+    aa('-c', '--cases', metavar="case,case", help="Only run these cases (default all).")
+    aa('-r', '--repeat', type=int, default=5, help="Timed runs per case; the best is reported.")
+    aa('-n', '--no-memory', action="store_true", help="Skip the peak-memory runs.")
+    aa('-b', '--baselines', metavar="path", default=DEFAULT_BASELINES, help="Baselines file (JSON).")
+    aa('-s', '--save', action="store_true", help="Store these results as the baselines for this score.")
+    aa('-p', '--tolerance', metavar="pct", type=float, default=15.0, help="Regression threshold, percent.")
+    args = parser.parse_args()
+    names = [name for (name, make) in CASES]
+    args.cases = args.cases.split(",") if args.cases else names
+    for name in args.cases:
+        if name not in names:
+            parser.error("Unknown case %s; cases are %s." % (name, ", ".join(names)))
+    if args.input and not os.path.isfile(args.input):
+        parser.error("No such file: " + args.input)
+    return args
+
+def main():
+    args = parse_and_validate_args()
+    warnings.simplefilter("ignore")   #legacy running status warns once per read
+    if args.input:
+        path = args.input
+    else:
+        data = score_from_args(args)
+        if args.keep:
+            with open(args.keep, "wb") as f:
+                f.write(data)
+        (fd, path) = tempfile.mkstemp(suffix=".mid")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+    try:
+        bench = Bench(path, args.repeat, not args.no_memory)
+        key = score_key(args)
+        print("In python", sys.version.split("\n")[0])
+        print("Score %s: %d tracks, %d events, %d bytes.\n" % (key, len(bench.pattern()), bench.events, bench.size))
+        baselines = load_baselines(args.baselines)
+        old = baselines.get(key, {})
+        print("%-14s %9s %10s %11s %11s %8s %8s" % ("case", "seconds", "events/s", "bytes/s", "peak", "time", "memory"))
+        results = {}
+        flagged = []
+        for (name, make_case) in CASES:
+            if name not in args.cases:
+                continue
+            result = results[name] = bench.run_case(make_case)
+            (time_pct, mem_pct) = regressions(result, old.get(name))
+            worse = [pct for pct in (time_pct, mem_pct) if pct is not None and pct > args.tolerance]
+            if worse:
+                flagged.append(name)
+            print("%-14s %9.3f %s %s %s %8s %8s%s" % (name, result["seconds"],
+                fmt_rate(result["events_per_sec"], 1e6, "M"), fmt_rate(result["bytes_per_sec"], 1e6, "MB"),
+                fmt_rate(result.get("peak_bytes"), 1e6, "MB"), fmt_pct(time_pct), fmt_pct(mem_pct),
+                "  REGRESSION" if worse else ""))
+    finally:
+        if not args.input:
+            os.unlink(path)
+    if args.save:
+        old.update(results)
+        baselines[key] = old
+        save_baselines(args.baselines, baselines)
+        print("\nSaved baselines for %s in %s." % (key, args.baselines))
+    elif not old:
+        print("\nNo baselines for this score; -s to save these.")
+    if flagged:
+        print("\nRegressions beyond %g%%: %s." % (args.tolerance, ", ".join(flagged)))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
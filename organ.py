@@ -449,12 +449,12 @@ class Organ(object):
             abst += e.tick
             e.tick = 0
             if abst >= self.prologue_end_tick:
-                return t0[0:i]
+                return t0.view(0, i)
             if isinstance(e, midi.InstrumentNameEvent) and self.prologue_expected_name:
                 if e.text != self.prologue_expected_name:
                     raise OrgdefError("Instrument name in %s is \"%s\", but organ definition expects \"%s\".",
                                           self.prologue_path, e.text, self.prologue_expected_name)
-        return t0[0:-1] # hope not end-track
+        return t0.view(0, -1) # hope not end-track
 
     def outyaml(self):
         def div_order(div):
@@ -0,0 +1,131 @@
+#! /usr/bin/python
+
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import sys
+assert(sys.version_info[0] >= 3)
+
+import argparse
+import random
+from struct import pack
+
+"""
+Deterministic generator of synthetic MIDI scores of any size, for benchmarking (see midibench.py) and
+for exercising the readers on files with known properties.  The same parameters and seed always give
+the same bytes.  The file is assembled byte by byte here, not with midi.FileWriter, so that it doesn't
+depend on the writer being measured, and so that it can contain what that writer never produces.
+
+A score is a format 1 file: a conductor track (time signature and tempo changes spread over the
+piece) and "tracks" staff tracks, each on its own channel, of "events" events apiece: notes (Note Off
+mostly as Note On velocity 0, as many sequencers write it), some controllers, and Hauptwerk-style Sysex
+messages at the given density.  Running status:
+
+   none      every general message has its status byte
+   standard  status bytes are omitted where running status allows (as this package writes)
+   legacy    running status is also used through Sysex events, as pre-2017 versions of this package
+             wrote it (the readers accept this, with their once-per-file warning)
+"""
+
+RUNNING_STATUS_MODES = ("none", "standard", "legacy")
+DELTAS = [0, 0, 0, 0, 60, 120, 120, 240, 240, 480, 960]
+
+def varlen(value):
+    res = [value & 0x7F]
+    value >>= 7
+    while value:
+        res.insert(0, (value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(res)
+
+def meta(delta, command, data):
+    return varlen(delta) + bytes([0xFF, command]) + varlen(len(data)) + bytes(data)
+
+def track_chunk(body):
+    return b'MTrk' + pack(">L", len(body)) + body
+
+def staff_track(rng, index, events, sysex_density, running_status):
+    channel = (index - 1) % 16
+    body = bytearray(meta(0, 0x03, b"staff%d" % index))
+    body += bytes([0, 0xC0 | channel, rng.randrange(128)])
+    last_status = None
+    sounding = []
+    tick = 0
+    for i in range(events):
+        delta = rng.choice(DELTAS)
+        tick += delta
+        if rng.random() < sysex_density:
+            body += varlen(delta) + bytes([0xF0, 0x7D, 0x01, rng.randrange(128), rng.randrange(128), 0xF7])
+            if running_status != "legacy":
+                last_status = None
+            continue
+        if rng.random() < 0.05:
+            (status, data) = (0xB0, [rng.choice((1, 7, 11, 64)), rng.randrange(128)])
+        elif sounding and (len(sounding) > 6 or rng.random() < 0.5):
+            pitch = sounding.pop(rng.randrange(len(sounding)))
+            (status, data) = (0x80, [pitch, 64]) if rng.random() < 0.1 else (0x90, [pitch, 0])
+        else:
+            pitch = rng.randrange(36, 97)
+            sounding.append(pitch)
+            (status, data) = (0x90, [pitch, rng.randrange(40, 110)])
+        status |= channel
+        body += varlen(delta)
+        if running_status == "none" or status != last_status:
+            body.append(status)
+        body += bytes(data)
+        last_status = status
+    body += meta(0, 0x2F, b"")
+    return (bytes(body), tick)
+
+def conductor_track(length, tempo_changes, resolution):
+    body = bytearray(meta(0, 0x03, b"conductor"))
+    body += meta(0, 0x58, [4, 2, 24, 8])
+    tick = 0
+    for i in range(tempo_changes + 1):
+        at = (length * i // (tempo_changes + 1)) // resolution * resolution
+        bpm = 60 + (i * 37) % 90
+        body += meta(at - tick, 0x51, pack(">L", 60000000 // bpm)[1:])
+        tick = at
+    body += meta(0, 0x2F, b"")
+    return bytes(body)
+
+def synthetic_score(tracks=16, events=20000, sysex_density=0.01, running_status="standard",
+                    tempo_changes=16, resolution=480, seed=1):
+    if running_status not in RUNNING_STATUS_MODES:
+        raise ValueError("running_status must be one of " + ", ".join(RUNNING_STATUS_MODES))
+    rng = random.Random(seed)
+    staves = [staff_track(rng, index, events, sysex_density, running_status) for index in range(1, tracks + 1)]
+    length = max([tick for (body, tick) in staves] + [0])
+    chunks = [conductor_track(length, tempo_changes, resolution)] + [body for (body, tick) in staves]
+    header = b'MThd' + pack(">LHHH", 6, 1, len(chunks), resolution)
+    return header + b''.join(map(track_chunk, chunks))
+
+def add_score_arguments(parser):
+    aa = parser.add_argument
+    aa('-t', '--tracks', type=int, default=16, help="Number of staff tracks (besides the conductor track).")
+    aa('-e', '--events', type=int, default=20000, help="Events per staff track.")
+    aa('-S', '--sysex', dest="sysex_density", type=float, default=0.01, help="Fraction of events that are Sysex.")
+    aa('-R', '--running-status', choices=RUNNING_STATUS_MODES, default="standard", help="Running status pattern.")
+    aa('-T', '--tempo-changes', type=int, default=16, help="Tempo changes in the conductor track.")
+    aa('-q', '--resolution', type=int, default=480, help="Ticks per quarter note.")
+    aa('--seed', type=int, default=1)
+
+def score_from_args(args):
+    return synthetic_score(args.tracks, args.events, args.sysex_density, args.running_status,
+                           args.tempo_changes, args.resolution, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic MIDI score.")
+    add_score_arguments(parser)
+    parser.add_argument('path', nargs=1, help="MIDI file to write")
+    args = parser.parse_args()
+    data = score_from_args(args)
+    with open(args.path[0], "wb") as f:
+        f.write(data)
+    print("Wrote %s, %d tracks, %d bytes." % (args.path[0], args.tracks + 1, len(data)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import io
+from array import array
+from itertools import accumulate
+
+import midi
+from conftest import event_keys
+
+
+def read_score(score_bytes):
+    return midi.read_midifile(io.BytesIO(score_bytes))
+
+def test_round_trip(score_bytes):
+    pattern = read_score(score_bytes)
+    back = midi.ColumnarPattern.from_pattern(pattern).to_pattern()
+    for (track, columnar) in zip(pattern, back):
+        assert event_keys(columnar) == event_keys(track)
+
+def test_slice_is_as_track_slice(score_bytes):
+    for track in read_score(score_bytes):
+        columnar = midi.ColumnarTrack.from_track(track)
+        for (a, b) in ((0, 10), (5, 40), (100, 101), (-20, None)):
+            assert event_keys(columnar[a:b]) == event_keys(track[a:b])
+        track.make_ticks_abs()
+        columnar.make_ticks_abs()
+        assert event_keys(columnar[7:30]) == event_keys(track[7:30])
+
+def test_select_keeps_times(score_bytes):
+    track = read_score(score_bytes)[1]
+    columnar = midi.ColumnarTrack.from_track(track)
+    notes = columnar.filter_status(midi.NoteOnEvent.statusmsg)
+    abs_ticks = [tick for (tick, event) in zip(track.abs_ticks(), track) if isinstance(event, midi.NoteOnEvent)]
+    assert list(notes.abs_ticks()) == abs_ticks
+
+def test_tick_mode_switches(score_bytes):
+    track = read_score(score_bytes)[2]
+    columnar = midi.ColumnarTrack.from_track(track)
+    rel = list(columnar.tick)
+    for i in range(2):
+        columnar.make_ticks_abs()
+        assert list(columnar.tick) == track.abs_ticks()
+        columnar.make_ticks_rel()
+        assert list(columnar.tick) == rel
+
+#After the first, switches exchange the kept columns; the track's own changes drop them.
+def test_tick_columns_kept(score_bytes):
+    track = read_score(score_bytes)[2]
+    columnar = midi.ColumnarTrack.from_track(track)
+    columnar.make_ticks_abs()
+    (rel, absolute) = columnar.tick_columns()
+    for i in range(2):
+        columnar.make_ticks_rel()
+        assert columnar.tick is rel
+        columnar.make_ticks_abs()
+        assert columnar.tick is absolute
+    columnar.make_ticks_rel()
+    columnar[3] = midi.NoteOnEvent(tick=track[3].tick + 7, pitch=60, velocity=64)
+    columnar.append(midi.NoteOffEvent(tick=11, pitch=60))
+    columnar.make_ticks_abs()
+    ticks = track.rel_ticks()
+    ticks[3] += 7
+    assert list(columnar.tick) == list(accumulate(ticks + [11]))
+    columnar.tick = array('q', columnar.tick[:10])
+    columnar.make_ticks_rel()
+    assert list(columnar.tick) == ticks[:10]
@@ -0,0 +1,47 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import argparse
+import re
+
+import midi
+import dumpmidi
+
+
+def dump_args(**options):
+    args = dict(brief=False, fromm=0, to=dumpmidi.BIG_MEASURE, mmap=False, starting_measure=1, seconds=False,
+                hex=False)
+    args.update(options)
+    return argparse.Namespace(**args)
+
+def batch(path, args):
+    dumpmidi.dump_midi_file_batchily(path, args, None)
+
+#The event lines of the dump, less -i's address and length.
+def dumped_events(capsys, dump, path, **options):
+    capsys.readouterr()
+    dump(path, dump_args(**options))
+    lines = capsys.readouterr().out.splitlines()
+    if dump is dumpmidi.dump_midi_file_incrementally:
+        return [m.group(1) for m in map(re.compile(r"^ *\d+ +\d+  (\d+ .*)$").match, lines) if m]
+    return [line for line in lines if re.match(r"^\d+ ", line)]
+
+#The time signature and tempo are in track 1, and change the measures of track 0's later events.
+def test_incremental_as_batch(tmp_path, capsys):
+    path = str(tmp_path / "conductor1.mid")
+    midi.write_midifile(path, midi.Pattern(resolution=480, tracks=[
+        midi.Track([midi.NoteOnEvent(tick=0, pitch=60, velocity=64), midi.NoteOffEvent(tick=1920, pitch=60),
+                    midi.NoteOnEvent(tick=1920, pitch=62, velocity=64), midi.EndOfTrackEvent(tick=0)]),
+        midi.Track([midi.TimeSignatureEvent(tick=960, numerator=3, denominator=4), midi.SetTempoEvent(tick=0, bpm=90),
+                    midi.NoteOnEvent(tick=3000, pitch=64, velocity=70), midi.EndOfTrackEvent(tick=0)])]))
+    assert "0 0   1920    3840  On   D 4 3+0 v 64" in dumped_events(capsys, batch, path)
+    for options in ({}, {"fromm": 3}, {"starting_measure": 0}):
+        expected = dumped_events(capsys, batch, path, **options)
+        assert expected and dumped_events(capsys, dumpmidi.dump_midi_file_incrementally, path, **options) == expected
+
+def test_incremental_as_batch_score(score_path, capsys):
+    assert dumped_events(capsys, dumpmidi.dump_midi_file_incrementally, score_path) == \
+        dumped_events(capsys, batch, score_path)
@@ -0,0 +1,67 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import io
+import pickle
+from struct import pack
+
+import pytest
+
+import midi
+from conftest import event_key, pattern_keys
+from synth_score import track_chunk, synthetic_score
+
+
+COMPACT_CLASSES = [cls for (key, cls) in sorted(midi.EventRegistry.CompactEvents.items(), key=str)
+                   if key != "name" and hasattr(cls, "_compact_")]
+
+def test_every_slotted_class_compact():
+    for key in midi.EventRegistry.Events:
+        if key != "name" and hasattr(midi.EventRegistry.Events[key], "_data_byte_slots_"):
+            assert midi.EventRegistry.CompactEvents[key] is midi.EventRegistry.Events[key].Compact
+    assert midi.NoteOnEvent.Compact in COMPACT_CLASSES
+
+@pytest.mark.parametrize("cls", COMPACT_CLASSES, ids=lambda cls: cls.__name__)
+def test_compact_as_regular(cls):
+    base = cls.__mro__[2]
+    data = list(range(1, 1 + cls.length))
+    (compact, regular) = (cls(tick=7, channel=3, data=data), base(tick=7, channel=3, data=data))
+    assert isinstance(compact, base) and cls.__slots__ == ("tick", "channel") + tuple(cls._data_byte_slots_)
+    assert not isinstance(compact.data, list)   #a view of the slots; there is no data list
+    assert event_key(compact) == event_key(regular)
+    for (dx, name) in enumerate(cls._data_byte_slots_):
+        assert getattr(compact, name) == getattr(regular, name) == data[dx]
+        compact.data[dx] = 100 + dx    #through the view
+        setattr(regular, name, 100 + dx)
+        assert getattr(compact, name) == getattr(regular, name)
+    assert event_key(compact) == event_key(regular)
+    assert event_key(pickle.loads(pickle.dumps(compact))) == event_key(compact)
+    with pytest.raises(ValueError):
+        compact.data = data + [0]
+
+def test_compact_note_api():
+    note = midi.NoteOnEvent.Compact(tick=0, channel=1, pitch=60, velocity=90)
+    assert (note.pitch, note.velocity, list(note.data), note.data[1:]) == (60, 90, [60, 90], [90])
+    note.pitch = 62
+    note.data[1] = 0
+    assert note.data == [62, 0] and note.velocity == 0
+    note.data = [64, 80]
+    assert (note.pitch, note.velocity) == (64, 80)
+    note.mark = "x"   #random properties are still permitted (in a dict made for them)
+    assert note.mark == "x"
+
+#A track cut off in a general message's data loses that message, compact or not.
+def test_compact_truncated_as_regular():
+    body = bytes([0, 0x90, 60, 64, 10, 62, 64, 5, 0xB0, 7])
+    data = b"MThd" + pack(">LHHH", 6, 0, 1, 480) + track_chunk(body)
+    expected = pattern_keys(midi.read_midifile(io.BytesIO(data)))
+    assert [len(track) for track in expected] == [2]
+    assert pattern_keys(midi.read_midifile(io.BytesIO(data), compact=True)) == expected
+    score = synthetic_score(tracks=2, events=400, sysex_density=0.05, seed=4)
+    for cut in range(len(score) - 12, len(score)):
+        for options in ({}, {"use_mmap": False, "lazy": True}):
+            assert pattern_keys(midi.read_midifile(io.BytesIO(score[:cut]), compact=True, **options)) == \
+                pattern_keys(midi.read_midifile(io.BytesIO(score[:cut])))
@@ -0,0 +1,91 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import io
+import warnings
+from struct import pack, unpack
+
+import midi
+from conftest import event_keys, pattern_keys
+from synth_score import meta, track_chunk, synthetic_score
+
+
+#(pattern, messages of the warnings given) of reading data with the given read_midifile options.
+def read_warning(data, **options):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        pattern = midi.read_midifile(io.BytesIO(data), **options)
+    return (pattern, [str(w.message) for w in caught if w.category is Warning])   #(the package's own)
+
+#Tracks with Meta events of unassigned metacommands, and a file written with running status through Sysex.
+def unknown_meta_file():
+    tracks = [meta(0, 0x60, b"x") + meta(10, 0x2F, b""),
+              bytes([0, 0x90, 60, 64, 5, 61, 64]) + meta(0, 0x61, b"y") + meta(0, 0x62, b"") + meta(0, 0x2F, b"")]
+    return b'MThd' + pack(">LHHH", 6, 1, len(tracks), 480) + b''.join(map(track_chunk, tracks))
+
+def test_parallel_warnings_as_serial():
+    for data in (unknown_meta_file(), synthetic_score(tracks=3, events=500, running_status="legacy", seed=5)):
+        (pattern, expected) = read_warning(data)
+        assert expected
+        for processes in (2, 1):
+            (parallel, given) = read_warning(data, parallel=processes)
+            assert given == expected
+            assert pattern_keys(parallel) == pattern_keys(pattern)
+
+def test_read_modes_agree(score_path):
+    expected = pattern_keys(midi.read_midifile(score_path))
+    for options in ({"use_mmap": True}, {"lazy": True}, {"use_mmap": True, "lazy": True}, {"compact": True},
+                    {"parallel": 2}, {"parallel": 2, "compact": True}):
+        assert pattern_keys(midi.read_midifile(score_path, **options)) == expected, options
+
+#The track chunks' data of a file.
+def track_chunks(data):
+    (pos, chunks) = (14, [])
+    while pos < len(data):
+        length = unpack(">L", data[pos + 4:pos + 8])[0]
+        chunks.append(data[pos + 8:pos + 8 + length])
+        pos += 8 + length
+    return chunks
+
+#The events of a track by the byte-iterator parser, stopping, as readers do, where the data runs out.
+def parsed_by_iterator(reader, chunk):
+    (events, trackdata) = ([], iter(chunk))
+    reader.RunningStatus = None
+    try:
+        while True:
+            events.append(reader.parse_midi_event(trackdata))
+    except StopIteration:
+        return events
+
+def test_offsets_as_iterator():
+    data = synthetic_score(tracks=3, events=800, sysex_density=0.05, tempo_changes=4, seed=11)
+    for chunk in track_chunks(data):
+        for cut in (len(chunk), len(chunk) - 1, len(chunk) // 2):
+            expected = event_keys(parsed_by_iterator(midi.FileReader(), chunk[:cut]))
+            assert event_keys(midi.FileReader().parse_track_data(chunk[:cut], midi.Track())) == expected
+            assert event_keys(midi.FileReader().parse_track_data(bytearray(chunk), midi.Track(), 0, cut)) == expected
+
+def test_offsets_warn_as_iterator():
+    data = synthetic_score(tracks=2, events=300, running_status="legacy", seed=2)
+    for parse in (lambda reader, chunk: reader.parse_track_data(chunk, midi.Track()), parsed_by_iterator):
+        reader = midi.FileReader()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            for chunk in track_chunks(data):
+                parse(reader, chunk)
+        assert reader.has_running_status_errors()
+        assert [str(w.message) for w in caught if w.category is Warning] == [midi.RUNNING_STATUS_COMPATIBILITY_MESSAGE]
+
+#A file cut short in its last track: the mapped reader parses what there is of it, as the plain reader does.
+def test_mapped_truncated_as_read(tmp_path, score_bytes):
+    path = tmp_path / "cut.mid"
+    path.write_bytes(score_bytes[:-100])
+    with open(str(path), "rb") as f:
+        expected = pattern_keys(midi.FileReader().read(f))
+    for lazy in (False, True):
+        pattern = midi.read_midifile(str(path), use_mmap=True, lazy=lazy)
+        assert pattern_keys(pattern) == expected
+        assert len(pattern) == 5 and 0 < len(pattern[-1]) < len(pattern[-2])
@@ -0,0 +1,86 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import warnings
+from struct import pack
+
+import pytest
+
+import midi
+import incremental_read_midi as IRM
+from conftest import event_key
+from synth_score import meta, track_chunk
+
+
+@pytest.mark.parametrize("chunk", [None, 64])
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_tree_reader_as_batch(score_path, monkeypatch, chunk, use_mmap):
+    if chunk:   #refilled many times, events straddling refills
+        monkeypatch.setattr(IRM.RechargeableFileCharacterIterator, "CHUNK", chunk)
+        monkeypatch.setattr(IRM.RechargeableFileCharacterIterator, "KEEP", 16)
+    pattern = midi.read_midifile(score_path, lazy=True)
+    with open(score_path, "rb") as f:
+        data = f.read()
+    reader = IRM.AsyTreeFileReader()
+    header = reader.access(score_path, use_mmap=use_mmap)
+    assert (header.resolution, header.format, header.n_tracks) == (pattern.resolution, pattern.format, len(pattern))
+    for (track, expected) in zip(header.tracks, pattern):
+        offsets = [track.address + 8 + offset for offset in expected.offsets()]
+        items = list(track.events)
+        assert [item.address for item in items] == offsets
+        assert [event_key(item.event) for item in items] == [event_key(event) for event in expected]
+        for item in items[::97]:
+            assert reader.file_iterator.bytes_at(item.address, item.length) == data[item.address:item.address + item.length]
+
+#Every event read, and the messages of the warnings given, until the reader stops or fails.
+def read_warning(events_of):
+    items = []
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        try:
+            for item in events_of():
+                items.append(item)
+        except RuntimeError:
+            pass
+    return ([(item.address, item.length, event_key(item.event)) for item in items],
+            [str(w.message) for w in caught if w.category is Warning])
+
+def tree_events(path):
+    for track in IRM.AsyTreeFileReader().access(path).tracks:
+        for item in track.events:
+            yield item
+
+def stabat_events(path):
+    return (item for item in IRM.AsyFileReader().asyread(path) if isinstance(item, IRM.Event))
+
+#Unknown Meta events straddling refills, each followed by a note in running status (which Meta events cancel).
+#Attempts that fail at a refill must not give their warnings, nor leave their running status, behind.
+def test_failed_attempts_undone(tmp_path, monkeypatch):
+    monkeypatch.setattr(IRM.RechargeableFileCharacterIterator, "CHUNK", 64)
+    monkeypatch.setattr(IRM.RechargeableFileCharacterIterator, "KEEP", 16)
+    body = bytes([0, 0x90, 60, 64])
+    for i in range(12):
+        body += meta(0, 0x60 + i, bytes(range(17 + 13 * i))) + bytes([10, 62, 64])
+    body += meta(0, 0x2F, b"")
+    data = b"MThd" + pack(">LHHH", 6, 0, 1, 480) + track_chunk(body)
+    for cut in (len(data), len(data) - 40, len(data) - 90):
+        path = tmp_path / ("cut%d.mid" % cut)
+        path.write_bytes(data[:cut])
+        (items, messages) = read_warning(lambda: tree_events(str(path)))
+        assert (items, messages) == read_warning(lambda: stabat_events(str(path)))
+        assert len(set(messages)) == len(messages) > 1   #each command is unknown once; running status once
+
+#The mapped stabat reader's items are the plain one's, events, headers and addresses alike, file cut short or not.
+def test_stabat_mapped_as_read(score_path, score_bytes, tmp_path):
+    def items(path, use_mmap):
+        return [item._replace(event=event_key(item.event)) if isinstance(item, IRM.Event) else item
+                for item in IRM.AsyFileReader().asyread(path, use_mmap=use_mmap)]
+    cut = tmp_path / "cut.mid"
+    cut.write_bytes(score_bytes[:-100])   #in the last track
+    for path in (score_path, str(cut)):
+        expected = items(path, False)
+        assert items(path, True) == expected
+        assert len([item for item in expected if isinstance(item, IRM.Track)]) == 5
@@ -0,0 +1,72 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+from struct import unpack
+
+import pytest
+
+import midi
+from conftest import event_key, event_keys
+
+
+def read_both(path, **options):
+    return (midi.read_midifile(path, lazy=True, **options), midi.read_midifile(path))
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_decoded_on_access(score_path, use_mmap):
+    (lazy, pattern) = read_both(score_path, use_mmap=use_mmap)
+    for (track, expected) in zip(lazy[1:], pattern[1:]):   #(the reader decodes the conductor track's tempi)
+        assert isinstance(track, midi.LazyTrack) and len(track) == len(expected)
+        assert list(track.rel_ticks()) == [event.tick for event in expected]
+        assert track.abs_ticks() == expected.abs_ticks()
+        assert list(track.statuses()) == expected.statuses()
+        assert track._n_decoded == 0
+        assert event_key(track[-2]) == event_key(expected[-2])
+        assert event_keys(track[3:9]) == event_keys(expected[3:9])
+        assert track._n_decoded == 7 and not track.is_materialized()
+        assert list(track.rel_ticks()) == [event.tick for event in expected]   #decoded ones included
+        assert event_keys(track) == event_keys(expected)
+        assert track.is_materialized()   #every event decoded
+        with pytest.raises(ValueError):
+            track.offsets()
+
+#Each offset is where its event's bytes start in the track data, as the batch parser finds it there.
+def test_offsets(score_path, score_bytes):
+    (lazy, pattern) = read_both(score_path)
+    pos = 14
+    for (track, expected) in zip(lazy, pattern):
+        (start, end) = (pos + 8, pos + 8 + unpack(">L", score_bytes[pos + 4:pos + 8])[0])
+        trackdata = score_bytes[start:end]
+        offsets = list(track.offsets()) + [len(trackdata)]
+        reader = midi.FileReader()
+        for dx in range(len(track)):
+            reader.RunningStatus = track.statuses()[dx]
+            (event, next_offset) = reader.parse_midi_event_at(trackdata, offsets[dx], len(trackdata))
+            assert (event_key(event), next_offset) == (event_key(expected[dx]), offsets[dx + 1])
+        pos = end
+
+CHANGES = {"setitem": lambda track: track.__setitem__(2, midi.NoteOnEvent(tick=1, pitch=60, velocity=1)),
+           "delitem": lambda track: track.__delitem__(slice(1, 4)),
+           "iadd": lambda track: track.__iadd__([midi.EndOfTrackEvent(tick=5)]),
+           "append": lambda track: track.append(midi.EndOfTrackEvent(tick=5)),
+           "insert": lambda track: track.insert(0, midi.NoteOffEvent(tick=0, pitch=60)),
+           "pop": lambda track: track.pop(5),
+           "reverse": lambda track: track.reverse(),
+           "sort": lambda track: track.sort(key=lambda event: event.statusmsg),
+           "clear": lambda track: track.clear()}
+
+#Changes decode everything first, then act just as on a Track.
+@pytest.mark.parametrize("change", sorted(CHANGES))
+def test_materialized_by_changes(score_path, change):
+    (lazy, pattern) = read_both(score_path)
+    (track, expected) = (lazy[1], pattern[1])
+    event_key(track[0])
+    length = len(track)
+    CHANGES[change](track)
+    CHANGES[change](expected)
+    assert track.is_materialized() and track._n_decoded == length
+    assert event_keys(list.__iter__(track)) == event_keys(expected)
+    assert track.rel_ticks() == [event.tick for event in expected]
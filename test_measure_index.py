@@ -0,0 +1,44 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import os
+
+import midi
+from conftest import event_key
+from MidiTimeModel import build_time_model
+from MidiMeasureIndex import MeasureIndex, measure_index, sidecar_path
+
+
+def keyed(pairs):
+    return [(tick, event_key(e)) for (tick, e) in pairs]
+
+def test_windows_as_whole_read(score_path):
+    pattern = midi.read_midifile(score_path)
+    time_model = build_time_model(pattern, 0)
+    index = measure_index(score_path)
+    assert os.path.exists(sidecar_path(score_path))
+    model = index.time_model(0)
+    assert [(tme.tick, tme.base_measure, tme.len_ticks) for tme in model] == \
+        [(tme.tick, tme.base_measure, tme.len_ticks) for tme in time_model]
+    last = time_model.ticks_to_MB(time_model.final_tick).measure
+    with open(score_path, "rb") as f:
+        for (tx, track) in enumerate(pattern):
+            pairs = list(zip(track.abs_ticks(), track))
+            for (first, end) in ((0, 0), (0, 3), (5, 9), (last - 2, last), (last + 1, last + 5)):
+                expected = [(t, e) for (t, e) in pairs if first <= time_model.ticks_to_MB(t).measure <= end]
+                assert keyed(index.events_in_measures(f, tx, first, end)) == keyed(expected)
+
+def test_sidecar_reused_until_file_changes(score_path, monkeypatch):
+    measure_index(score_path)
+    builds = []
+    build = MeasureIndex.build
+    monkeypatch.setattr(MeasureIndex, "build", classmethod(lambda cls, path: builds.append(path) or build(path)))
+    measure_index(score_path)
+    assert builds == []
+    with open(score_path, "ab") as f:
+        f.write(b"\0")
+    measure_index(score_path)
+    assert builds == [score_path]
@@ -0,0 +1,69 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import gc
+import io
+import os
+import sys
+import asyncio
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import midi
+import MidiAsync
+import MidiParseCache
+from MidiTimeModel import build_time_model
+
+
+def encoded(pattern):
+    buf = io.BytesIO()
+    midi.write_midifile(buf, pattern)
+    return buf.getvalue()
+
+def test_imports_alone():
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in ("MidiAsync", "MidiParseCache", "MidiMeasureIndex", "MidiTimeModel"):
+        subprocess.run([sys.executable, "-c", "import " + module], cwd=here, check=True)
+
+#The tools' common base loads the parse cache and asyncio only when they are asked for.
+def test_tools_import_neither():
+    here = os.path.dirname(os.path.abspath(__file__))
+    check = "import sys, midi_tool_base; assert not {'asyncio', 'zlib', 'MidiAsync', 'MidiParseCache'} & set(sys.modules)"
+    subprocess.run([sys.executable, "-c", check], cwd=here, check=True)
+
+def test_measures_numbered_as_converters(score_bytes):
+    pattern = midi.read_midifile(io.BytesIO(score_bytes))
+    model = asyncio.run(MidiAsync.build_time_model(pattern))
+    assert [tme.base_measure for tme in model] == [tme.base_measure for tme in build_time_model(pattern, 1)]
+    assert model[0].base_measure == 1
+
+def test_thread_jobs_leave_gc_alone(score_bytes, monkeypatch):
+    seen = []
+    read = midi.read_midifile
+    monkeypatch.setattr(midi, "read_midifile", lambda *args, **kw: seen.append(gc.isenabled()) or read(*args, **kw))
+    MidiAsync.parse_midi_bytes(score_bytes)
+    assert seen == [True]
+    assert not MidiAsync.AsyncMidiIO().pause_gc
+    with ProcessPoolExecutor(1) as pool:
+        assert MidiAsync.AsyncMidiIO(parse_executor=pool).pause_gc
+
+def test_read_model_write(score_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(MidiParseCache, "configured_cache", lambda: None)
+    pattern = midi.read_midifile(score_path)
+    time_model = build_time_model(pattern, 1)
+    out = str(tmp_path / "out.mid")
+    async def run(midi_io):
+        (read, (modelled, model)) = await asyncio.gather(midi_io.read_midifile(score_path),
+                                                         midi_io.read_and_time_model(score_path))
+        await midi_io.write_midifile(out, read)
+        return (read, modelled, model)
+    with ProcessPoolExecutor(2) as pool:
+        for midi_io in (MidiAsync.AsyncMidiIO(), MidiAsync.AsyncMidiIO(parse_executor=pool)):
+            (read, modelled, model) = asyncio.run(run(midi_io))
+            assert encoded(read) == encoded(modelled) == encoded(pattern)
+            assert model.ticks_to_seconds(9999) == time_model.ticks_to_seconds(9999)
+            with open(out, "rb") as f:
+                assert f.read() == encoded(pattern)
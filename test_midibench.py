@@ -0,0 +1,77 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import io
+import json
+import sys
+import warnings
+
+import pytest
+
+import midi
+import midibench
+from conftest import pattern_keys
+from synth_score import synthetic_score, RUNNING_STATUS_MODES
+
+
+def read_warning(data):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        pattern = midi.read_midifile(io.BytesIO(data))
+    return (pattern, [str(w.message) for w in caught if w.category is Warning])
+
+def test_score_deterministic():
+    assert synthetic_score(tracks=3, events=500, seed=4) == synthetic_score(tracks=3, events=500, seed=4)
+    assert synthetic_score(tracks=3, events=500, seed=4) != synthetic_score(tracks=3, events=500, seed=5)
+    with pytest.raises(ValueError):
+        synthetic_score(running_status="sometimes")
+
+def test_score_shape():
+    pattern = midi.read_midifile(io.BytesIO(synthetic_score(tracks=5, events=400, sysex_density=0.1,
+                                                            tempo_changes=7, resolution=240, seed=2)))
+    assert (pattern.format, pattern.resolution, len(pattern)) == (1, 240, 6)
+    assert len([event for event in pattern[0] if isinstance(event, midi.SetTempoEvent)]) == 8
+    for (index, track) in enumerate(pattern[1:]):
+        assert len(track) == 400 + 3   #and name, program change, end of track
+        assert {event.channel for event in track if not isinstance(event, (midi.MetaEvent, midi.SysexEvent))} == {index}
+        assert 10 < len([event for event in track if isinstance(event, midi.SysexEvent)]) < 80
+
+#The modes differ in bytes, not events; only legacy running status (through Sysex) warns.
+def test_running_status_modes():
+    scores = {mode: synthetic_score(tracks=2, events=600, sysex_density=0.05, running_status=mode, seed=6)
+              for mode in RUNNING_STATUS_MODES}
+    assert len(scores["none"]) > len(scores["standard"]) > len(scores["legacy"])
+    (expected, messages) = read_warning(scores["none"])
+    assert messages == []
+    for mode in ("standard", "legacy"):
+        (pattern, messages) = read_warning(scores[mode])
+        assert pattern_keys(pattern) == pattern_keys(expected)
+        assert messages == ([midi.RUNNING_STATUS_COMPATIBILITY_MESSAGE] if mode == "legacy" else [])
+
+def run_bench(monkeypatch, capsys, *argv):
+    monkeypatch.setattr(sys, "argv", ["midibench.py", "-t", "2", "-e", "300", "-r", "1", "-c", "read,write"] + list(argv))
+    try:
+        midibench.main()
+        status = 0
+    except SystemExit as exit:
+        status = exit.code
+    return (status, capsys.readouterr().out)
+
+def test_baselines(monkeypatch, capsys, tmp_path):
+    path = str(tmp_path / "baselines.json")
+    (status, out) = run_bench(monkeypatch, capsys, "-b", path)
+    assert status == 0 and "No baselines" in out
+    (status, out) = run_bench(monkeypatch, capsys, "-b", path, "-s")
+    with open(path) as f:
+        baselines = json.load(f)
+    assert status == 0 and list(baselines) == ["synth:t2-e300-S0.01-standard-T16-q480-seed1"]
+    assert sorted(baselines["synth:t2-e300-S0.01-standard-T16-q480-seed1"]) == ["read", "write"]
+    for result in baselines["synth:t2-e300-S0.01-standard-T16-q480-seed1"].values():
+        result["seconds"] /= 1000.0   #as if this machine had got very much slower
+    with open(path, "w") as f:
+        json.dump(baselines, f)
+    (status, out) = run_bench(monkeypatch, capsys, "-b", path)
+    assert status == 1 and "Regressions beyond 15%: read, write." in out
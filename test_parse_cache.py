@@ -0,0 +1,49 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import os
+import warnings
+
+import midi
+from conftest import pattern_keys
+from MidiParseCache import ParseCache
+from synth_score import synthetic_score
+
+
+def read_warning(cache, path, start_measure=1):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        result = cache.read_and_time_model(path, start_measure)
+    return result + ([str(w.message) for w in caught if w.category is Warning],)
+
+def test_hit_is_as_parse(tmp_path, score_path):
+    cache = ParseCache(str(tmp_path / "cache"), 1 << 30)
+    (pattern, time_model, cached, given) = read_warning(cache, score_path)
+    assert not cached and not given
+    (again, again_model, cached, given) = read_warning(cache, score_path)
+    assert cached and not given
+    assert pattern_keys(again) == pattern_keys(pattern) == pattern_keys(midi.read_midifile(score_path))
+    assert again_model.ticks_to_MB(12345) == time_model.ticks_to_MB(12345)
+    assert read_warning(cache, score_path, 0)[1].ticks_to_MB(0).measure == 0
+
+def test_hit_warns_as_parse(tmp_path):
+    path = str(tmp_path / "legacy.mid")
+    with open(path, "wb") as f:
+        f.write(synthetic_score(tracks=2, events=300, running_status="legacy", seed=2))
+    cache = ParseCache(str(tmp_path / "cache"), 1 << 30)
+    (pattern, time_model, cached, given) = read_warning(cache, path)
+    assert not cached and given == [midi.RUNNING_STATUS_COMPATIBILITY_MESSAGE]
+    (pattern, time_model, cached, given) = read_warning(cache, path)
+    assert cached and given == [midi.RUNNING_STATUS_COMPATIBILITY_MESSAGE]
+
+def test_changed_file_is_read_again(tmp_path, score_path):
+    cache = ParseCache(str(tmp_path / "cache"), 1 << 30)
+    read_warning(cache, score_path)
+    with open(score_path, "wb") as f:
+        f.write(synthetic_score(tracks=2, events=100, seed=9))
+    (pattern, time_model, cached, given) = read_warning(cache, score_path)
+    assert not cached and len(pattern) == 3
+    assert len(cache.entry_paths()) == 1
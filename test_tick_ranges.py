@@ -0,0 +1,69 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import io
+
+import midi
+from MidiTimeModel import build_time_model
+
+
+def make_track(n=20):
+    return midi.Track([midi.NoteOnEvent(tick=10, pitch=40 + i, velocity=64) for i in range(n)])
+
+#What events_between must give, worked out afresh.
+def between(track, t0, t1):
+    return [(tick, event) for (tick, event) in zip(track.abs_ticks(), track) if t0 <= tick < t1]
+
+def check(track):
+    for (t0, t1) in ((0, 10**9), (15, 95), (500, 560), (95, 15)):
+        assert list(track.events_between(t0, t1)) == between(track, t0, t1)
+
+def test_ranges_follow_changes():
+    late = midi.NoteOnEvent(tick=500, pitch=1, velocity=1)
+    changes = [lambda t: t.insert(0, late), lambda t: t.pop(),
+               lambda t: t.__setitem__(3, midi.NoteOffEvent(tick=200, pitch=2)),
+               lambda t: t.sort(key=lambda e: -e.data[0]), lambda t: t.reverse(),
+               lambda t: t.__delitem__(slice(2, 4)), lambda t: t.extend([late]), lambda t: t.remove(late),
+               lambda t: t.append(midi.NoteOffEvent(tick=7, pitch=3)),
+               lambda t: t.__iadd__([midi.NoteOnEvent(tick=20, pitch=4, velocity=1)]),
+               lambda t: setattr(t[2], "tick", t[2].tick + 100),   #in place, the track unaware
+               lambda t: t.make_ticks_abs(), lambda t: setattr(t[-1], "tick", t[-1].tick + 50),
+               lambda t: t.make_ticks_rel(),
+               lambda t: t.clear()]
+    for make in (make_track, lambda: make_track().view(), lambda: make_track().view(3, 15),
+                 lambda: midi.read_midifile(io.BytesIO(encoded(make_track())), lazy=True)[0]):
+        track = make()
+        check(track)
+        for change in changes:
+            change(track)
+            check(track)
+
+def encoded(track):
+    buf = io.BytesIO()
+    midi.write_midifile(buf, midi.Pattern(resolution=480, tracks=[track]))
+    return buf.getvalue()
+
+def test_view_of_changing_track():
+    track = make_track()
+    view = track.view(5, 15)
+    check(view)
+    track[6] = midi.NoteOffEvent(tick=300, pitch=2)
+    check(view)
+
+def test_measure_windows(score_bytes):
+    for options in ({}, {"lazy": True}):
+        pattern = midi.read_midifile(io.BytesIO(score_bytes), **options)
+        time_model = build_time_model(pattern, 1, as_read=True)
+        last = time_model.ticks_to_MB(time_model.final_tick).measure
+        for (first, end) in ((0, 1), (1, 1), (4, 9), (last - 1, last + 3), (last + 2, last + 4)):
+            merged = []
+            for (tx, track) in enumerate(pattern):
+                expected = [(tick, event) for (tick, event) in zip(track.abs_ticks(), track)
+                            if first <= time_model.ticks_to_MB(tick).measure <= end]
+                assert list(track.events_in_measures(first, end, time_model)) == expected
+                merged += [(tick, tx, event) for (tick, event) in expected]
+            merged.sort(key=lambda item: item[:2])
+            assert list(pattern.events_in_measures(first, end, time_model)) == merged
@@ -0,0 +1,97 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import io
+from fractions import Fraction
+
+import midi
+from MidiTimeModel import build_time_model, TimeModelCursor, MeasureBeat
+from bench_timemodel import stress_model, make_queries, outcome, linear_MB_to_ticks, linear_dur_to_ticks
+
+
+def shape(model):
+    return ([(tme.tick, tme.signature, tme.base_measure, tme.len_ticks) for tme in model],
+            [(tmpe.base_tick, tmpe.qpm, tmpe.base_seconds) for tmpe in model.tempo_model])
+
+def reread(pattern, path, **options):
+    midi.write_midifile(path, pattern)
+    return midi.read_midifile(path, **options)
+
+#Signatures and tempi in the second track as well as the first.
+def two_conductors():
+    first = midi.Track([midi.TimeSignatureEvent(tick=0, numerator=3, denominator=4),
+                        midi.SetTempoEvent(tick=2880, bpm=100), midi.EndOfTrackEvent(tick=1000)])
+    second = midi.Track([midi.SetTempoEvent(tick=480, bpm=90), midi.TimeSignatureEvent(tick=960, numerator=6, denominator=8),
+                         midi.NoteOnEvent(tick=9000, pitch=60, velocity=64), midi.EndOfTrackEvent(tick=0)])
+    return midi.Pattern(resolution=480, tracks=[first, second])
+
+def test_conductor_map_as_tracks(score_bytes, tmp_path):
+    path = str(tmp_path / "conductors.mid")
+    for pattern in (two_conductors(), midi.read_midifile(io.BytesIO(score_bytes))):
+        expected = shape(build_time_model(pattern, 1))
+        for options in ({}, {"lazy": True}, {"use_mmap": True}, {"parallel": 2}, {"compact": True}):
+            assert shape(build_time_model(reread(pattern, path, **options), 1, as_read=True)) == expected, options
+
+def test_all_tracks_count():
+    model = build_time_model(two_conductors(), 1)
+    assert [tme.signature for tme in model] == [(3, 4), (6, 8)]
+    assert [round(tmpe.qpm) for tmpe in model.tempo_model] == [120, 90, 100]
+    assert model.final_tick == 10440
+
+def test_edited_pattern_is_modelled_anew(tmp_path):
+    pattern = reread(two_conductors(), str(tmp_path / "conductors.mid"))
+    pattern[1].insert(0, midi.SetTempoEvent(tick=0, bpm=60))
+    pattern[0][-1].tick += 20000
+    model = build_time_model(pattern, 1)
+    assert [round(tmpe.qpm) for tmpe in model.tempo_model] == [60, 90, 100]
+    assert model.final_tick == 23880
+    assert shape(build_time_model(pattern, 1, as_read=True)) != shape(model)   #the caller's word is taken
+
+def test_bisected_lookups_as_linear():
+    model = stress_model(120, 4)
+    (measures, ticks) = make_queries(model, 3000, 4)
+    for (measure, beat) in measures + [(model[0].base_measure - 1, 0), (model[-1].final_measure + 1, 0)]:
+        assert outcome(model.MB_to_ticks, measure, beat) == outcome(linear_MB_to_ticks, model, measure, beat)
+    for tick in ticks + [model.final_tick]:
+        assert outcome(model.dur_to_ticks, tick, 1.5) == outcome(linear_dur_to_ticks, model, tick, 1.5)
+
+def test_batches_as_single_lookups():
+    model = stress_model(120, 4)
+    ticks = make_queries(model, 3000, 4)[1] + [0, model.final_tick]
+    for order in (ticks, sorted(ticks)):
+        (measures, beats) = model.ticks_to_MB_batch(order)
+        assert list(zip(measures, beats)) == [tuple(model.ticks_to_MB(tick)) for tick in order]
+        assert list(model.ticks_to_seconds_batch(order)) == [model.ticks_to_seconds(tick) for tick in order]
+    assert outcome(model.ticks_to_MB_batch, [0, model.final_tick + 1]) is None
+
+def test_seconds_to_ticks_inverts():
+    model = stress_model(120, 4)
+    ticks = make_queries(model, 3000, 4)[1] + [0, model.final_tick]
+    seconds = [model.ticks_to_seconds(tick) for tick in ticks]
+    assert [model.seconds_to_ticks(sec) for sec in seconds] == ticks
+    assert list(model.seconds_to_ticks_batch(seconds)) == ticks
+    assert list(model.seconds_to_ticks_batch(sorted(seconds))) == sorted(ticks)
+    for sec in (-0.5, model.ticks_to_seconds(model.final_tick) + 1):
+        assert outcome(model.seconds_to_ticks, sec) is None
+        assert outcome(model.seconds_to_ticks_batch, [sec]) is None
+
+def test_cursor_as_model():
+    model = stress_model(120, 4)
+    ticks = make_queries(model, 3000, 4)[1]
+    cursor = TimeModelCursor(model)
+    for order in (sorted(ticks) + [model.final_tick], sorted(ticks, reverse=True), ticks):
+        for tick in order:
+            assert cursor.locate(tick) == (model.ticks_to_MB(tick), model.ticks_to_seconds(tick))
+    for tick in (-1, model.final_tick + 1):
+        assert outcome(cursor.ticks_to_MB, tick) is None
+
+def test_beat_strings_as_rep_beat():
+    model = stress_model(120, 4)
+    beats = [model.ticks_to_MB(tick).beat for tick in make_queries(model, 3000, 4)[1]]
+    for beat in beats + [0, 2, 2.0, 1.5, 1/3.0, 0.0001, Fraction(3, 2)]:
+        for repeat in range(2):   #the second time from the memo
+            assert str(MeasureBeat(7, beat)) == "%d+%s" % (7, MeasureBeat.rep_beat(beat))
+    assert (str(MeasureBeat(1, 2)), str(MeasureBeat(1, 2.0))) == ("1+2", "1+2.0")
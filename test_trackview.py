@@ -0,0 +1,104 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import pytest
+
+import midi
+from conftest import event_keys
+
+
+def make_track(n=8):
+    return midi.Track([midi.NoteOnEvent(tick=10 * i, pitch=60 + i, velocity=64) for i in range(n)])
+
+#The view's events must be the list's after each change made to both.
+def check_as_list(change):
+    track = make_track()
+    view = track.view(2, 6)
+    model = list(track[2:6])
+    change(view)
+    change(model)
+    assert len(view) == len(model)
+    assert event_keys(view) == event_keys(model)
+    assert event_keys([view[i] for i in range(len(view))]) == event_keys(model)
+    assert event_keys(view[1:]) == event_keys(model[1:])
+    assert [event.pitch for event in track] == list(range(60, 68))   #never changed through the view
+
+def test_append():
+    event = midi.NoteOffEvent(tick=5, pitch=70)
+    check_as_list(lambda events: events.append(event))
+
+def test_del():
+    def change(events):
+        del events[0]
+    check_as_list(change)
+
+def test_insert():
+    event = midi.NoteOffEvent(tick=5, pitch=71)
+    check_as_list(lambda events: events.insert(1, event))
+
+def test_several_changes():
+    new = [midi.NoteOffEvent(tick=tick, pitch=72 + tick) for tick in range(3)]
+    def change(events):
+        events.extend(new[:2])
+        events.pop(0)
+        events.remove(events[1])
+        events[0] = new[2]
+        events.reverse()
+    check_as_list(change)
+
+#The view's copy is of the events, too: its tick rewrites and in-place changes to its events leave the track's.
+@pytest.mark.parametrize("change", [
+    lambda view: view.make_ticks_abs(),
+    lambda view: (view.make_ticks_abs(), view.make_ticks_rel()),
+    lambda view: view.append(midi.NoteOffEvent(tick=5, pitch=70)),
+    lambda view: view.insert(0, midi.NoteOffEvent(tick=5, pitch=70)),
+    lambda view: view.extend([midi.NoteOffEvent(tick=5, pitch=70)]),
+    lambda view: view.pop(),
+    lambda view: view.remove(view.copy_on_write()[0]),   #an event of the copy
+    lambda view: view.__delitem__(0),
+    lambda view: view.__setitem__(0, midi.NoteOffEvent(tick=5, pitch=70)),
+    lambda view: view.sort(key=lambda event: -event.pitch),
+    lambda view: view.reverse(),
+    lambda view: view.clear(),
+    lambda view: view.__iadd__([midi.NoteOffEvent(tick=5, pitch=70)]),
+])
+def test_track_unchanged(change):
+    track = make_track()
+    expected = event_keys(track)
+    view = track.view(0, 3)
+    change(view)
+    view.copy_on_write()
+    for event in view:
+        event.tick += 1000
+        event.data[0] = 0
+    assert event_keys(track) == expected
+    assert track.tick_relative
+
+def test_ticks_in_copy():
+    track = make_track(4)
+    view = track.view(1, 3)
+    view.make_ticks_abs()
+    assert ([event.tick for event in view], view.tick_relative) == ([10, 30], False)
+    assert ([event.tick for event in track], track.tick_relative) == ([0, 10, 20, 30], True)
+
+def test_views_read_in_place():
+    track = make_track()
+    view = track.view(1, 5)
+    assert list(view) == track[1:5]
+    assert list(view[::-1]) == track[4:0:-1]
+    track[2] = midi.NoteOffEvent(tick=15, pitch=80)
+    assert view[1] is track[2]
+
+def test_shrinking_track():
+    track = make_track()
+    view = track.view(4, 8)
+    whole = track.view()
+    del track[6:]
+    for use in (len, list, lambda v: v[0], lambda v: v[1:]):
+        with pytest.raises(RuntimeError):
+            use(whole if use is len else view)
+    assert list(track.view(2, 4)) == track[2:4]
+    assert len(track.view(5, 100)) == 1   #made after, as a slice
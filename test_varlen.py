@@ -0,0 +1,34 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+from midi.util import read_varlen, read_varlen_at, write_varlen, VARLEN_BYTES
+from bench_varlen import make_values, per_value_read, per_offset_read, read_varlens, write_varlens
+
+
+#The MIDI standard's own examples, each value at the edges of one to four bytes among them.
+ENCODINGS = {0: b"\x00", 0x40: b"\x40", 0x7F: b"\x7F", 0x80: b"\x81\x00", 0x2000: b"\xC0\x00",
+             0x3FFF: b"\xFF\x7F", 0x4000: b"\x81\x80\x00", 0x100000: b"\xC0\x80\x00", 0x1FFFFF: b"\xFF\xFF\x7F",
+             0x200000: b"\x81\x80\x80\x00", 0x8000000: b"\xC0\x80\x80\x00", 0xFFFFFFF: b"\xFF\xFF\xFF\x7F"}
+
+def test_encodings():
+    for (value, encoding) in ENCODINGS.items():
+        assert bytes(write_varlen(value)) == VARLEN_BYTES[value] == encoding
+        assert read_varlen(iter(encoding + b"\x05")) == value
+        for data in (b"\x99" + encoding + b"\x05", bytearray(b"\x99" + encoding)):
+            assert read_varlen_at(data, 1) == (value, 1 + len(encoding))
+
+def test_memoized_only_short():
+    for value in ENCODINGS:
+        VARLEN_BYTES[value]
+        assert (value in VARLEN_BYTES) == (value < 0x4000)
+
+def test_bulk_as_per_value():
+    for mix in ("deltas", "dense"):
+        values = make_values(3000, 7, mix)
+        data = bytearray(b"".join(VARLEN_BYTES[value] for value in values))
+        assert write_varlens(values) == bytes(data)
+        assert per_value_read(data) == per_offset_read(data) == list(read_varlens(data)) == values
+        assert list(read_varlens(data + b"\x83\x80")) == values   #a truncated last one is ignored
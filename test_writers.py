@@ -0,0 +1,97 @@
+#BSG MIDI VPO Tools system (VPOMIDITools)
+#Copyright (C) 2016-2020 by Bernard S. Greenberg
+#Offered according to GNU Public License Version 3
+#See file LICENSE in project directory.
+#
+
+import io
+from operator import attrgetter
+
+import pytest
+
+import midi
+
+
+def written(write, *args, **kw):
+    buf = io.BytesIO()
+    write(buf, *args, **kw)
+    return buf.getvalue()
+
+def test_write_reproduces_file(score_bytes):
+    for options in ({}, {"compact": True}, {"lazy": True}):
+        pattern = midi.read_midifile(io.BytesIO(score_bytes), **options)
+        assert written(midi.write_midifile, pattern) == score_bytes, options
+
+def test_streaming_as_write(score_bytes):
+    pattern = midi.read_midifile(io.BytesIO(score_bytes))
+    generators = ((event for event in track) for track in pattern)
+    assert written(midi.write_midifile_streaming, generators, pattern.resolution) == score_bytes
+    pattern.make_ticks_abs()
+    assert written(midi.write_midifile_streaming, pattern, pattern.resolution) == score_bytes
+    assert written(midi.write_midifile_streaming, map(iter, pattern), pattern.resolution, tick_relative=False) == score_bytes
+
+#As MergeTracks merged before write_midifile_merged: a stable sort of all the events by absolute tick, without
+#the tracks' End of Track events, and one a tick after the last event.  (This changes the pattern's events.)
+def merged_by_sort(pattern):
+    pattern.make_ticks_abs()
+    events = sorted((event for track in pattern for event in track if not isinstance(event, midi.EndOfTrackEvent)),
+                    key=attrgetter("tick"))
+    track = midi.Track(events, tick_relative=False)
+    track.make_ticks_rel()
+    track.append(midi.EndOfTrackEvent(tick=1))
+    return midi.Pattern(resolution=pattern.resolution, format=0, tracks=[track])
+
+def test_merged_as_sorted(score_bytes):
+    expected = written(midi.write_midifile, merged_by_sort(midi.read_midifile(io.BytesIO(score_bytes))))
+    pattern = midi.read_midifile(io.BytesIO(score_bytes))
+    assert written(midi.write_midifile_merged, pattern, pattern.resolution) == expected
+    assert written(midi.write_midifile, pattern) == score_bytes   #the tracks aren't changed
+
+#The isinstance chain the per-class encoders replaced, delta time and all.
+def reference_encoding(event, running_status):
+    encoding = bytearray(midi.write_varlen(event.tick))
+    if isinstance(event, midi.MetaEvent):
+        return (encoding + bytes([0xFF, event.metacommand]) + midi.write_varlen(len(event.data)) + bytes(event.data), None)
+    if isinstance(event, midi.SysexEvent):
+        return (encoding + bytes([0xF0] + list(event.data) + [0xF7]), None)
+    status = event.statusmsg | event.channel
+    if status != running_status:
+        encoding.append(status)
+    return (encoding + bytes(list(event.data)), status)
+
+#An event of every class with an encoder at import, each twice (the second in running status, where that applies).
+def every_class_events():
+    events = []
+    for cls in list(midi.EVENT_ENCODERS):
+        if issubclass(cls, midi.MetaEvent):
+            command = 0x60 if cls is midi.UnknownMetaEvent else cls.metacommand
+            event = cls(tick=300, data=[1, 2, 3], metacommand=command)
+        elif issubclass(cls, midi.SysexEvent):
+            event = cls(tick=0, data=[0x7D, 1, 2])
+        else:
+            event = cls(tick=20000, channel=5, data=list(range(10, 10 + cls.length)))
+        events += [event, event]
+    return events
+
+def test_encoders_as_reference():
+    events = every_class_events()
+    assert {event.__class__ for event in events} >= {midi.NoteOnEvent, midi.NoteOnEvent.Compact, midi.PitchWheelEvent,
+                                                     midi.SetTempoEvent, midi.UnknownMetaEvent, midi.SysexEvent}
+    writer = midi.FileWriter()
+    writer.RunningStatus = running_status = None
+    for event in events:
+        (expected, running_status) = reference_encoding(event, running_status)
+        assert writer.encode_midi_event(event) == bytes(expected), event
+        assert writer.RunningStatus == running_status
+
+def test_encoders_made_on_sight():
+    class LoudNoteOnEvent(midi.NoteOnEvent):
+        NoEventReg = True
+    writer = midi.FileWriter()
+    writer.RunningStatus = 0x91
+    assert writer.encode_midi_event(LoudNoteOnEvent(tick=1, channel=1, pitch=60, velocity=127)) == bytes([1, 60, 127])
+    assert LoudNoteOnEvent in midi.EVENT_ENCODERS
+    with pytest.raises(ValueError):
+        writer.encode_midi_event(midi.NoteOnEvent(tick=1, channel=1, pitch=200, velocity=1))
+    with pytest.raises(ValueError):
+        writer.encode_midi_event(midi.AbstractEvent(tick=1))